@@ -6,12 +6,15 @@ import torch
 from torch import nn
 from pointconfig.model import (
     model_info,
-    FIRST_LAYER,
-    SECOND_LAYER,
-    THIRD_LAYER,
+    make_model,
     LEARNING_RATE,
-    INPUT_LENGTH,
+    PRIME,
+    DIMENSION,
+    ONE_HOT,
+    AUTOREGRESSIVE,
+    model_kind_of,
 )
+from pointconfig.lightweight_score import get_context
 from pointconfig.trainingtracker import TrainingTracker
 from torch.serialization import add_safe_globals
 
@@ -53,6 +56,10 @@ def checkpoint(
         "model": complete_model_info["model"].state_dict(),
         "optimizer": complete_model_info["optimizer"].state_dict(),
         "training_tracker": training_tracker,
+        "prime": complete_model_info["context"].prime,
+        "dimension": complete_model_info["context"].dimension,
+        "stage_encoding": complete_model_info["stage_encoding"],
+        "model_kind": model_kind_of(complete_model_info["model"]),
     }
     old_model_name = ""
     for filename in os.listdir(save_path):
@@ -76,20 +83,21 @@ def checkpoint(
 
 
 def load_model(path):
-    model = nn.Sequential(
-        nn.Linear(INPUT_LENGTH, FIRST_LAYER),
-        nn.ReLU(),
-        nn.Linear(FIRST_LAYER, SECOND_LAYER),
-        nn.ReLU(),
-        nn.Linear(SECOND_LAYER, THIRD_LAYER),
-        nn.ReLU(),
-        nn.Linear(THIRD_LAYER, 1),
-        nn.Sigmoid(),
-    )
-    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
-
     add_safe_globals([TrainingTracker])
     checkpoint_info = torch.load(path, weights_only=False)
+
+    # checkpoints from before contexts were saved are all the default field
+    context = get_context(
+        checkpoint_info.get("prime", PRIME),
+        checkpoint_info.get("dimension", DIMENSION),
+    )
+    stage_encoding = checkpoint_info.get("stage_encoding", ONE_HOT)
+    model = make_model(
+        context.word_length,
+        stage_encoding,
+        checkpoint_info.get("model_kind", AUTOREGRESSIVE),
+    )
+    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
     model.load_state_dict(checkpoint_info["model"])
     optimizer.load_state_dict(checkpoint_info["optimizer"])
     return (
@@ -97,26 +105,43 @@ def load_model(path):
         optimizer,
         checkpoint_info["loop_num"],
         checkpoint_info["training_tracker"],
+        context,
+        stage_encoding,
     )
 
-def load_checkpoint(save_path, top_examples):
+
+def load_checkpoint(
+    save_path,
+    top_examples,
+    context=None,
+    stage_encoding=ONE_HOT,
+    model_kind=AUTOREGRESSIVE,
+):
     if save_path is not None:
         save_path = Path(save_path)
         for filename in os.listdir(save_path):
             if filename.startswith("model"):
                 model_file = filename
         model_path = save_path / model_file
-        model, optimizer, base_loop_num, training_tracker = load_model(
-            model_path
-        )
+        (
+            model,
+            optimizer,
+            base_loop_num,
+            training_tracker,
+            context,
+            stage_encoding,
+        ) = load_model(model_path)
         loss_function = nn.BCELoss()
         complete_model_info = {
             "model": model,
             "loss_function": loss_function,
             "optimizer": optimizer,
+            "context": context,
+            "stage_encoding": stage_encoding,
+            "model_kind": model_kind_of(model),
         }
     else:
-        complete_model_info = model_info()
+        complete_model_info = model_info(context, stage_encoding, model_kind)
         training_tracker = TrainingTracker(num_top_examples=top_examples)
         base_loop_num = 0
 
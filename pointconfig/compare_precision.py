@@ -0,0 +1,73 @@
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+from pointconfig.checkpoint import load_model
+from pointconfig.make_subset import sample_subsets, elite_count, top_subsets
+
+
+def compare_precisions(
+    model, num_subsets, precisions=pcm.INFERENCE_PRECISIONS, context=None
+):
+    """
+    Samples num_subsets words from model in each precision and returns,
+    per precision, the sampling time, the mean number of points included
+    and the mean of all scores and of the scores above the 90th
+    percentile. The first precision is the baseline the others are read
+    against.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    results = {}
+    for precision in precisions:
+        sampler = pcm.inference_model(model, precision)
+        # one warm up call so lazy initialisation is not timed
+        sample_subsets(sampler, 1, context)
+        tick = time.perf_counter()
+        subsets = sample_subsets(sampler, num_subsets, context)
+        sample_time = time.perf_counter() - tick
+        words = subsets[:, : context.word_length].numpy().astype(np.uint8)
+        scores = context.score_words_blocked(words)
+        _, elite_scores = top_subsets(
+            words, scores, elite_count(num_subsets, 90)
+        )
+        results[precision] = {
+            "sample_time": sample_time,
+            "points": float(words.sum(axis=1).mean()),
+            "score_mean": float(scores.mean()),
+            "elite_mean": float(elite_scores.mean()),
+        }
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--model_path")
+    parser.add_argument("--num_subsets", type=int, default=lws.BATCH_SIZE)
+    parser.add_argument("--prime", type=int, default=lws.PRIME)
+    parser.add_argument("--dimension", type=int, default=lws.DIMENSION)
+    parser.add_argument(
+        "--stage_encoding", choices=pcm.STAGE_ENCODINGS, default=pcm.ONE_HOT
+    )
+    args = parser.parse_args()
+    if args.model_path:
+        model, _, _, _, context, _ = load_model(args.model_path)
+    else:
+        context = lws.get_context(args.prime, args.dimension)
+        model = pcm.make_model(context.word_length, args.stage_encoding)
+    model.eval()
+    results = compare_precisions(model, args.num_subsets, context=context)
+    for precision, result in results.items():
+        print(
+            f"{precision}: {result['sample_time']:.2f}s, "
+            f"{result['points']:.1f} points, "
+            f"score mean {result['score_mean']:.1f}, "
+            f"elite mean {result['elite_mean']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
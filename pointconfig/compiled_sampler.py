@@ -0,0 +1,122 @@
+"""
+Sampling loop compiled with TorchScript. make_subset.sample_subsets
+returns to Python for every stage of every batch, paying the dispatcher
+and autograd overhead of each small op word_length times. Here the
+forward pass, the Bernoulli draw and the first layer update of all the
+stages run in one scripted call under torch.inference_mode.
+"""
+
+import warnings
+from typing import List
+
+import torch
+from torch import nn
+
+import pointconfig.model as pcm
+
+# scripted sampling loops by architecture, see architecture_of
+_SAMPLE_LOOPS = {}
+
+
+class _SampleLoop(nn.Module):
+    def forward(
+        self,
+        pre_activations: torch.Tensor,
+        bit_columns: torch.Tensor,
+        stage_rows: torch.Tensor,
+        weights: List[torch.Tensor],
+        biases: List[torch.Tensor],
+        all_subsets: torch.Tensor,
+    ) -> torch.Tensor:
+        num_subsets = pre_activations.shape[0]
+        for stage in range(bit_columns.shape[0]):
+            hidden = pre_activations + stage_rows[stage]
+            for layer in range(len(weights)):
+                hidden = torch.addmm(
+                    biases[layer], torch.relu(hidden), weights[layer].t()
+                )
+            probs = torch.sigmoid(hidden).flatten()
+            included = (torch.rand(num_subsets) < probs).to(torch.float32)
+            all_subsets[:, stage] = included
+            pre_activations.addr_(included, bit_columns[stage])
+        return all_subsets
+
+
+def architecture_of(model):
+    """
+    Stage encoding and parameter shapes, which is everything the
+    scripted loop specialises on.
+    """
+    return (
+        pcm.stage_encoding_of(model),
+        tuple(tuple(parameter.shape) for parameter in model.parameters()),
+    )
+
+
+def _sample_loop(architecture):
+    if architecture not in _SAMPLE_LOOPS:
+        with warnings.catch_warnings():
+            # torch.jit is deprecated in favour of torch.compile, which
+            # takes far longer to compile and is no faster here
+            warnings.simplefilter("ignore")
+            _SAMPLE_LOOPS[architecture] = torch.jit.script(_SampleLoop())
+    return _SAMPLE_LOOPS[architecture]
+
+
+class CompiledSampler:
+    """
+    Samples like make_subset.sample_subsets, and makes the same draws
+    from the same RNG state, for a float32 model built by
+    model.make_model. The weights are read on every call so training
+    updates are picked up without recompiling. Pass it to sample_subsets
+    (or anything calling it) in place of the model. num_threads sets the
+    torch intra-op threads while sampling, the host default if None.
+    """
+
+    def __init__(self, model, num_threads=None):
+        if isinstance(model, pcm.InferenceModel) or not _scriptable(
+            pcm.first_layer_parts(model)[3]
+        ):
+            raise ValueError("compiled sampling needs a float32 model")
+        self.model = model
+        self.stage_encoding = pcm.stage_encoding_of(model)
+        self.num_threads = num_threads
+        self.sample_loop = _sample_loop(architecture_of(model))
+
+    def sample(self, num_subsets, word_length):
+        bit_columns, stage_rows, bias, rest = pcm.first_layer_parts(self.model)
+        layers = list(rest)[1::2]
+        host_threads = torch.get_num_threads()
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+        try:
+            with torch.inference_mode():
+                all_subsets = torch.zeros(
+                    (
+                        num_subsets,
+                        pcm.subset_width(word_length, self.stage_encoding),
+                    )
+                )
+                self.sample_loop(
+                    bias.repeat(num_subsets, 1),
+                    bit_columns.contiguous(),
+                    stage_rows,
+                    [layer.weight for layer in layers],
+                    [layer.bias for layer in layers],
+                    all_subsets,
+                )
+        finally:
+            torch.set_num_threads(host_threads)
+        # a normal tensor again, inference tensors cannot be used in
+        # autograd and the subsets become training rows
+        return all_subsets.clone()
+
+
+def _scriptable(rest):
+    # ReLU then Linear for every hidden layer and a final Sigmoid
+    kinds = [type(layer) for layer in rest]
+    return (
+        len(kinds) % 2 == 1
+        and kinds[-1] is nn.Sigmoid
+        and kinds[:-1] == [nn.ReLU, nn.Linear] * (len(kinds) // 2)
+    )
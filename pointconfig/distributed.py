@@ -0,0 +1,303 @@
+"""
+Data-parallel training over worker processes joined by the CPU gloo
+backend. Every loop each rank samples and scores its share of the
+loop's subsets, the words and scores are all-gathered so every rank
+picks the same elites, and each training step splits one global
+minibatch of world_size * batch_size rows between the ranks, summing
+their gradients with an all-reduce before every rank takes the same
+Adam step. Rank 0 alone tracks, prints and writes checkpoints.
+"""
+
+import os
+import socket
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+import pointconfig.model as pcm
+from pointconfig.checkpoint import checkpoint, load_checkpoint
+from pointconfig.expand_subset import ExpandedSubsets
+from pointconfig.lightweight_score import (
+    BATCH_SIZE,
+    PRIME,
+    DIMENSION,
+    get_context,
+)
+from pointconfig.make_subset import generate_subsets, elite_count, top_subsets
+from pointconfig.plot import make_thresholds_and_data
+
+TRAIN_BATCH_SIZE = 1024
+
+
+def train_distributed(
+    world_size=None,
+    loops=5000,
+    top_examples=100,
+    save_path=None,
+    prime=PRIME,
+    dimension=DIMENSION,
+    stage_encoding=pcm.ONE_HOT,
+    model_kind=pcm.AUTOREGRESSIVE,
+    samples_per_loop=BATCH_SIZE,
+    elite_percentile=90,
+    checkpoint_every=50,
+    seed=None,
+):
+    """
+    train.train on world_size processes (one per CPU by default), each
+    with one torch and one numba thread. samples_per_loop is rounded up
+    to a multiple of world_size. Resuming from save_path works as in
+    train.train.
+    """
+    if world_size is None:
+        world_size = os.cpu_count()
+    if seed is None:
+        seed = int(torch.randint(2**31, (1,)))
+    settings = {
+        "loops": loops,
+        "top_examples": top_examples,
+        "save_path": save_path,
+        "prime": prime,
+        "dimension": dimension,
+        "stage_encoding": stage_encoding,
+        "model_kind": model_kind,
+        "samples_per_loop": samples_per_loop,
+        "elite_percentile": elite_percentile,
+        "checkpoint_every": checkpoint_every,
+        "seed": seed,
+    }
+    mp.spawn(
+        _worker,
+        args=(world_size, settings, _free_port()),
+        nprocs=world_size,
+        join=True,
+    )
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _worker(rank, world_size, settings, port):
+    dist.init_process_group(
+        "gloo",
+        init_method=f"tcp://127.0.0.1:{port}",
+        rank=rank,
+        world_size=world_size,
+    )
+    # the processes provide the parallelism
+    torch.set_num_threads(1)
+    try:
+        _train_rank(rank, world_size, **settings)
+    finally:
+        dist.destroy_process_group()
+
+
+def _train_rank(
+    rank,
+    world_size,
+    loops,
+    top_examples,
+    save_path,
+    prime,
+    dimension,
+    stage_encoding,
+    model_kind,
+    samples_per_loop,
+    elite_percentile,
+    checkpoint_every,
+    seed,
+):
+    complete_model_info, training_tracker, base_loop_num = load_checkpoint(
+        save_path,
+        top_examples,
+        get_context(prime, dimension),
+        stage_encoding,
+        model_kind,
+    )
+    model = complete_model_info["model"]
+    context = complete_model_info["context"]
+    stage_encoding = complete_model_info["stage_encoding"]
+    word_length = context.word_length
+    # a new model is initialised differently on every rank
+    for parameter in model.parameters():
+        dist.broadcast(parameter.data, 0)
+    torch.manual_seed(seed + 1 + rank)
+    shuffle_generator = torch.Generator().manual_seed(seed)
+
+    local_samples = -(-samples_per_loop // world_size)
+    num_elites = elite_count(local_samples * world_size, elite_percentile)
+    threshold_data = make_thresholds_and_data(
+        context.prime, context.total_directions, context.dimension
+    )
+    first_save = bool(save_path is None)
+    for loop_num in range(loops):
+        start_time = time.perf_counter()
+        model.eval()
+        subsets, scores = generate_subsets(
+            model, local_samples, num_threads=1, context=context
+        )
+        words, scores = _all_gather_words(
+            subsets[:, :word_length].numpy().astype(np.uint8),
+            scores,
+            world_size,
+        )
+        best_words, best_scores = top_subsets(words, scores, num_elites)
+        best_subsets = torch.zeros(
+            (len(best_words), pcm.subset_width(word_length, stage_encoding))
+        )
+        best_subsets[:, :word_length] = torch.from_numpy(best_words).float()
+        loss = _train_shard(
+            ExpandedSubsets(best_subsets, word_length, stage_encoding),
+            model,
+            complete_model_info["loss_function"],
+            complete_model_info["optimizer"],
+            rank,
+            world_size,
+            shuffle_generator,
+        )
+        if rank:
+            continue
+
+        training_tracker.update_best_examples(
+            best_subsets, best_scores, context
+        )
+        training_tracker.tracking_lists["loss"].append(loss)
+        training_tracker.update_lists(
+            best_scores, threshold_data, base_loop_num + loop_num
+        )
+        loop_time = time.perf_counter() - start_time
+        print(
+            f"At {base_loop_num + loop_num + 1}, Loss: {loss}\n"
+            f"Best scores mean: {best_scores.mean()}\n"
+            f"{world_size} ranks, {3600 / loop_time:.0f} loops/hour"
+        )
+        if (loop_num + 1) % checkpoint_every == 0:
+            save_path = checkpoint(
+                base_loop_num + loop_num + 1,
+                complete_model_info,
+                training_tracker,
+                first_save,
+                save_path,
+            )
+            first_save = False
+
+
+def _all_gather_words(words, scores, world_size):
+    """
+    Every rank's words (bit-packed on the wire) and scores, in rank order.
+    """
+    packed = torch.from_numpy(np.packbits(words, axis=1))
+    scores = torch.from_numpy(np.asarray(scores, dtype=np.float64))
+    all_packed = [torch.empty_like(packed) for _ in range(world_size)]
+    all_scores = [torch.empty_like(scores) for _ in range(world_size)]
+    dist.all_gather(all_packed, packed)
+    dist.all_gather(all_scores, scores)
+    all_words = np.unpackbits(
+        torch.cat(all_packed).numpy(), axis=1, count=words.shape[1]
+    )
+    return all_words, torch.cat(all_scores).numpy()
+
+
+def _train_shard(
+    data,
+    model,
+    loss_function,
+    optimizer,
+    rank,
+    world_size,
+    shuffle_generator,
+    batch_size=TRAIN_BATCH_SIZE,
+):
+    """
+    model.train_model over world_size * batch_size row minibatches, of
+    which this rank computes rows rank * batch_size onwards. Returns the
+    mean loss over all rows.
+    """
+    data_size = len(data)
+    indices = torch.randperm(data_size, generator=shuffle_generator)
+    global_batch_size = batch_size * world_size
+    model.train()
+    total_loss = 0.0
+    for start in range(0, data_size, global_batch_size):
+        batch_indices = indices[start : start + global_batch_size]
+        shard = batch_indices[rank * batch_size : (rank + 1) * batch_size]
+        loss = _shard_loss(
+            data.rows(shard), model, loss_function, len(batch_indices)
+        )
+        optimizer.zero_grad()
+        loss.backward()
+        _all_reduce_gradients(model)
+        optimizer.step()
+        total_loss += loss.item() * len(batch_indices)
+
+    total_loss = torch.tensor(total_loss)
+    dist.all_reduce(total_loss)
+    return total_loss.item() / data_size
+
+
+def _shard_loss(rows, model, loss_function, global_rows):
+    """
+    This shard's part of the mean loss over global_rows rows, so the
+    shards' gradients sum to the gradient of the whole minibatch.
+    """
+    if not len(rows):
+        # no rows left for this rank, contribute zero gradients
+        return sum(parameter.sum() for parameter in model.parameters()) * 0.0
+    predictions = model(rows[:, :-1])
+    loss = loss_function(predictions, rows[:, -1:])
+    return loss * len(rows) / global_rows
+
+
+def _all_reduce_gradients(model):
+    # one flat all-reduce instead of one per parameter
+    gradients = [parameter.grad for parameter in model.parameters()]
+    flat = torch.cat([gradient.flatten() for gradient in gradients])
+    dist.all_reduce(flat)
+    offset = 0
+    for gradient in gradients:
+        gradient.copy_(
+            flat[offset : offset + gradient.numel()].view_as(gradient)
+        )
+        offset += gradient.numel()
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--world_size", type=int)
+    parser.add_argument("--loops", type=int, default=5000)
+    parser.add_argument("--model_path")
+    parser.add_argument("--prime", type=int, default=PRIME)
+    parser.add_argument("--dimension", type=int, default=DIMENSION)
+    parser.add_argument(
+        "--stage_encoding", choices=pcm.STAGE_ENCODINGS, default=pcm.ONE_HOT
+    )
+    parser.add_argument(
+        "--model_kind", choices=pcm.MODEL_KINDS, default=pcm.AUTOREGRESSIVE
+    )
+    parser.add_argument("--samples_per_loop", type=int, default=BATCH_SIZE)
+    parser.add_argument("--elite_percentile", type=float, default=90)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    train_distributed(
+        world_size=args.world_size,
+        loops=args.loops,
+        save_path=args.model_path,
+        prime=args.prime,
+        dimension=args.dimension,
+        stage_encoding=args.stage_encoding,
+        model_kind=args.model_kind,
+        samples_per_loop=args.samples_per_loop,
+        elite_percentile=args.elite_percentile,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Streaming sampler with early rejection. Every row of the batch keeps the
+plane and line incidence of its prefix next to the sampled bits, which
+gives an upper bound on the score any completion of the prefix can get.
+Rows whose bound falls below the current elite bar are retired and the
+slot restarts from stage 0, so the stages go to rows that can still
+become elites.
+"""
+
+import time
+
+import numpy as np
+import torch
+from numba import njit
+
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+from pointconfig.make_subset import elite_count, top_subsets
+
+
+class RejectionStats:
+    """
+    Rows started, completed and retired during one stream_elites call.
+    A step advances every row in flight by one stage.
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.started = 0
+        self.completed = 0
+        self.retired = 0
+        self.wall_time = 0.0
+
+    def summary(self):
+        return (
+            f"{self.completed} completed and {self.retired} retired of "
+            f"{self.started} started in {self.steps} steps "
+            f"({self.wall_time:.2f}s)"
+        )
+
+
+class _PrefixState:
+    """
+    Incidence of a batch of prefixes, rows are reset to the fixed points.
+    """
+
+    def __init__(self, batch_size, context):
+        self.context = context
+        self.sizes = np.zeros(batch_size, dtype=np.int64)
+        self.plane_incidence = np.zeros(
+            (batch_size, context.total_directions, context.prime),
+            dtype=context.plane_incidence_dtype,
+        )
+        self.line_incidence = np.zeros(
+            (
+                batch_size,
+                context.total_directions,
+                context.total_line_intercepts,
+            ),
+            dtype=context.line_incidence_dtype,
+        )
+        # planes over the limit and their total incidence
+        self.plane_over = np.zeros((batch_size, 2), dtype=np.int64)
+        self.line_max = np.zeros(batch_size, dtype=np.int64)
+
+    def reset(self, rows):
+        _reset_rows(
+            rows,
+            self.context.fixed_indices,
+            self.context.prime,
+            self.context.tables,
+            self.sizes,
+            self.plane_incidence,
+            self.line_incidence,
+            self.plane_over,
+            self.line_max,
+        )
+
+    def add(self, points):
+        """
+        points[row] is the ambient index joining the row, or -1 for none.
+        """
+        _add_points(
+            points,
+            self.context.prime,
+            self.context.tables,
+            self.sizes,
+            self.plane_incidence,
+            self.line_incidence,
+            self.plane_over,
+            self.line_max,
+        )
+
+    def upper_bounds(self, remaining):
+        bounds = np.empty(len(self.sizes), dtype=np.int64)
+        _upper_bounds(
+            self.sizes,
+            remaining,
+            self.context.prime,
+            self.context.total_directions,
+            self.context.total_line_intercepts,
+            self.plane_over,
+            self.line_max,
+            bounds,
+        )
+        return bounds
+
+
+def prefix_upper_bounds(words, stage, context=None):
+    """
+    Upper bound on the score of any word agreeing with each of words
+    on the positions before stage.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    state = _PrefixState(len(words), context)
+    state.reset(np.arange(len(words)))
+    for position in range(stage):
+        state.add(
+            np.where(words[:, position], context.valid_indices[position], -1)
+        )
+    return state.upper_bounds(
+        np.full(len(words), context.word_length - stage, dtype=np.int64)
+    )
+
+
+def stream_elites(
+    model,
+    num_elites,
+    batch_size=lws.BATCH_SIZE,
+    num_samples=None,
+    max_steps=None,
+    threshold=None,
+    context=None,
+):
+    """
+    Samples with batch_size rows in flight until num_samples (batch_size
+    by default) rows have completed, and returns the num_elites best
+    completed subsets, their scores and the RejectionStats. Rows are
+    retired once their upper bound is below threshold (e.g. the last
+    elite bar) or the running num_elites best score. Without retirements
+    this is generate_subsets(batch_size); with them the completed rows
+    are all ones that could still become elites. After max_steps stages
+    (4 word lengths by default) nothing more is retired, so the call
+    always finishes.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    word_length = context.word_length
+    if num_samples is None:
+        num_samples = batch_size
+    if max_steps is None:
+        max_steps = 4 * word_length
+    outside_bar = -np.inf if threshold is None else threshold
+    stats = RejectionStats()
+    start_time = time.perf_counter()
+
+    rows = torch.arange(batch_size)
+    bits = torch.zeros((batch_size, word_length), dtype=torch.float32)
+    stages = torch.zeros(batch_size, dtype=torch.int64)
+    state = _PrefixState(batch_size, context)
+    state.reset(rows.numpy())
+    stats.started = batch_size
+
+    # running best completed words, the bar once num_elites are in
+    best_words = np.zeros((0, word_length), dtype=np.uint8)
+    best_scores = np.empty(0)
+    with torch.no_grad():
+        bit_columns, stage_rows, bias, rest = pcm.first_layer_parts(model)
+        pre_activations = bias.repeat(batch_size, 1)
+        while stats.completed < num_samples:
+            probs = rest(pre_activations + stage_rows[stages]).flatten()
+            included = (torch.rand(batch_size) < probs).to(torch.float32)
+            bits[rows, stages] = included
+            pre_activations += included.unsqueeze(1) * bit_columns[stages]
+            # stages is advanced in place below, keep this step's copy
+            stage_array = stages.numpy().copy()
+            state.add(
+                np.where(
+                    included.numpy() > 0,
+                    context.valid_indices[stage_array],
+                    -1,
+                )
+            )
+            stages += 1
+            stats.steps += 1
+
+            done = np.flatnonzero(stage_array == word_length - 1)
+            if len(done):
+                words = bits[done].numpy().astype(np.uint8)
+                best_words, best_scores = top_subsets(
+                    np.concatenate([best_words, words]),
+                    np.concatenate([best_scores, context.score_words(words)]),
+                    num_elites,
+                )
+                stats.completed += len(done)
+
+            retired = np.empty(0, dtype=np.int64)
+            if stats.steps < max_steps:
+                bar = outside_bar
+                if num_elites and len(best_scores) == num_elites:
+                    bar = max(bar, best_scores.min())
+                bounds = state.upper_bounds(word_length - stage_array - 1)
+                retired = np.flatnonzero(
+                    (bounds < bar) & (stage_array < word_length - 1)
+                )
+                stats.retired += len(retired)
+
+            restart = np.concatenate([done, retired])
+            if len(restart):
+                restart_rows = torch.from_numpy(restart)
+                bits[restart_rows] = 0.0
+                stages[restart_rows] = 0
+                pre_activations[restart_rows] = bias
+                state.reset(restart)
+                stats.started += len(restart)
+
+    order = np.argsort(best_scores)[::-1]
+    best_subsets = torch.zeros(
+        (
+            len(order),
+            pcm.subset_width(word_length, pcm.stage_encoding_of(model)),
+        )
+    )
+    best_subsets[:, :word_length] = torch.from_numpy(best_words[order]).float()
+    stats.wall_time = time.perf_counter() - start_time
+    return best_subsets, best_scores[order], stats
+
+
+def best_from_stream(
+    model,
+    batch_size,
+    percentile=90,
+    threshold=None,
+    context=None,
+    num_samples=None,
+):
+    """
+    train.best_from_model on top of stream_elites, keeping as many elites
+    as the percentile of num_samples (batch_size by default) does.
+    """
+    if num_samples is None:
+        num_samples = batch_size
+    return stream_elites(
+        model,
+        elite_count(num_samples, percentile),
+        batch_size,
+        num_samples,
+        threshold=threshold,
+        context=context,
+    )
+
+
+@njit(cache=True)
+def _add_point(
+    row,
+    point_index,
+    prime,
+    tables,
+    plane_incidence,
+    line_incidence,
+    plane_over,
+    line_max,
+):
+    dimension, plane_lookup, line_lookup = tables[:3]
+    for direction_index in range(plane_incidence.shape[1]):
+        plane = lws._plane_intercept(
+            prime, dimension, plane_lookup, point_index, direction_index
+        )
+        incidence = plane_incidence[row, direction_index, plane] + 1
+        plane_incidence[row, direction_index, plane] = incidence
+        if incidence == prime + 1:
+            plane_over[row, 0] += 1
+            plane_over[row, 1] += incidence
+        elif incidence > prime + 1:
+            plane_over[row, 1] += 1
+
+        line = lws._line_intercept(
+            prime, dimension, line_lookup, point_index, direction_index
+        )
+        incidence = line_incidence[row, direction_index, line] + 1
+        line_incidence[row, direction_index, line] = incidence
+        line_max[row] = max(line_max[row], incidence)
+
+
+@njit(cache=True)
+def _add_points(
+    points,
+    prime,
+    tables,
+    sizes,
+    plane_incidence,
+    line_incidence,
+    plane_over,
+    line_max,
+):
+    for row in range(len(points)):
+        if points[row] < 0:
+            continue
+        sizes[row] += 1
+        _add_point(
+            row,
+            points[row],
+            prime,
+            tables,
+            plane_incidence,
+            line_incidence,
+            plane_over,
+            line_max,
+        )
+
+
+@njit(cache=True)
+def _reset_rows(
+    rows,
+    fixed_indices,
+    prime,
+    tables,
+    sizes,
+    plane_incidence,
+    line_incidence,
+    plane_over,
+    line_max,
+):
+    for row in rows:
+        plane_incidence[row] = 0
+        line_incidence[row] = 0
+        plane_over[row] = 0
+        line_max[row] = 0
+        sizes[row] = len(fixed_indices)
+        for point_index in fixed_indices:
+            _add_point(
+                row,
+                point_index,
+                prime,
+                tables,
+                plane_incidence,
+                line_incidence,
+                plane_over,
+                line_max,
+            )
+
+
+@njit(cache=True)
+def _upper_bounds(
+    sizes,
+    remaining,
+    prime,
+    total_directions,
+    total_line_intercepts,
+    plane_over,
+    line_max,
+    bounds,
+):
+    # incidences only grow, so an over limit plane or line stays over
+    size_score = prime + prime**2
+    plane_total = total_directions * prime * total_line_intercepts
+    line_total = total_directions * total_line_intercepts * prime
+    equidistribution_max = total_directions * prime * total_directions
+    for row in range(len(sizes)):
+        # largest line threshold over the multiples still reachable that
+        # pass the size section, which needs 3 <= multiple <= prime - 3
+        lowest = max(3, -(-sizes[row] // prime))
+        highest = min(prime - 3, (sizes[row] + remaining[row]) // prime)
+        line_threshold = -1
+        for multiple in range(lowest, highest + 1):
+            line_threshold = max(
+                line_threshold, min(multiple, prime - multiple)
+            )
+        if line_threshold < 0:
+            # the size section fails, which scores at most this
+            bounds[row] = size_score
+        elif plane_over[row, 0] > 0:
+            bounds[row] = size_score + plane_total - plane_over[row, 1]
+        elif line_max[row] > line_threshold:
+            bounds[row] = size_score + plane_total + line_total
+            bounds[row] -= line_max[row]
+        else:
+            bounds[row] = (
+                size_score + plane_total + line_total + equidistribution_max
+            )
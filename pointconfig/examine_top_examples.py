@@ -1,29 +1,36 @@
 import json
 from argparse import ArgumentParser
-from pointconfig.word_to_point import word_to_point, check_equidistribution
+import numpy as np
+from pointconfig.lightweight_fourier import equidistribution
 from pointconfig.lightweight_score import PRIME, DIMENSION
 
 
-def check_from_json(path):
+def check_from_json(path, prime=PRIME, dimension=DIMENSION):
+    """Number of equidistributed directions for each saved example"""
     with open(path, "r", encoding="utf-8") as f:
         top_examples = json.load(f)
     word_list = [pair["subset"] for pair in top_examples.values()]
-    pointset_list = [
-        word_to_point(word, PRIME, DIMENSION) for word in word_list
-    ]
-    return [
-        len(check_equidistribution(pointset, PRIME, DIMENSION))
-        for pointset in pointset_list
-    ]
+    if not word_list:
+        return []
+    true_words = np.array(
+        [[int(in_out) for in_out in word] for word in word_list],
+        dtype=np.uint8,
+    )
+    mask, _ = equidistribution(true_words, prime, dimension)
+    return mask.sum(axis=1).tolist()
 
 
 def main():
     parser = ArgumentParser()
     parser.add_argument("--examples_path")
+    parser.add_argument("--prime", type=int, default=PRIME)
+    parser.add_argument("--dimension", type=int, default=DIMENSION)
     args = parser.parse_args()
     if not args.examples_path:
         raise ValueError("need to provide json path after --examples_path")
-    print(sorted(check_from_json(args.examples_path)))
+    print(
+        sorted(check_from_json(args.examples_path, args.prime, args.dimension))
+    )
 
 
 if __name__ == "__main__":
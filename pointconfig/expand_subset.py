@@ -1,25 +1,114 @@
+import numpy as np
 import torch
 
 import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
 
 INPUT_LENGTH = 2 * lws.WORD_LENGTH
 
 
-def expand_subset(subset: torch.Tensor):
-    repeats = torch.unsqueeze(subset, 1).expand(-1, lws.WORD_LENGTH)
+def _stage_tracker(word_length, stage_encoding):
+    # one row per stage, the one-hot or the stage index
+    if stage_encoding == pcm.EMBEDDING:
+        return torch.arange(word_length, dtype=torch.float32).unsqueeze(1)
+    return torch.eye(word_length)
+
+
+def expand_subset(
+    subset: torch.Tensor,
+    word_length=lws.WORD_LENGTH,
+    stage_encoding=pcm.ONE_HOT,
+):
+    repeats = torch.unsqueeze(subset, 1).expand(-1, word_length)
     intermediate = torch.tril(repeats, diagonal=-1)
-    stage_tracker = torch.eye(lws.WORD_LENGTH)
+    stage_tracker = _stage_tracker(word_length, stage_encoding)
     return torch.cat([intermediate, stage_tracker], dim=1)
 
 
-def expand_subsets(subsets: torch.Tensor):
-    assert subsets.shape[1] == INPUT_LENGTH
-    subsets = subsets[:, : lws.WORD_LENGTH]
+def expand_subsets(
+    subsets: torch.Tensor,
+    word_length=lws.WORD_LENGTH,
+    stage_encoding=pcm.ONE_HOT,
+):
+    """
+    Training rows for every stage of every subset: the bits before the
+    stage, the stage (one-hot or index, see model.STAGE_ENCODINGS) and
+    the bit at the stage as the target.
+    """
+    assert subsets.shape[1] == pcm.subset_width(word_length, stage_encoding)
+    subsets = subsets[:, :word_length]
     good_batch_size = subsets.shape[0]
-    stage_tracker = torch.eye(lws.WORD_LENGTH).expand(good_batch_size, -1, -1)
-    stages = subsets.unsqueeze(1).expand(-1, lws.WORD_LENGTH, -1)
+    stage_tracker = _stage_tracker(word_length, stage_encoding).expand(
+        good_batch_size, -1, -1
+    )
+    stages = subsets.unsqueeze(1).expand(-1, word_length, -1)
     tri_stages = stages.tril(diagonal=-1)
     truth = stages.diagonal(dim1=1, dim2=2).unsqueeze(2)
     return torch.cat([tri_stages, stage_tracker, truth], dim=2).reshape(
-        good_batch_size * lws.WORD_LENGTH, INPUT_LENGTH + 1
+        good_batch_size * word_length, -1
     )
+
+
+class ExpandedSubsets:
+    """
+    The rows of expand_subsets(subsets, word_length, stage_encoding)
+    without building them: only the bit-packed words are kept and
+    rows(indices) builds the requested rows, row subset * word_length
+    + stage being the stage of that subset. train_model draws its
+    minibatches from it, so training memory is a minibatch plus
+    word_length bits per subset.
+    """
+
+    def __init__(
+        self,
+        subsets: torch.Tensor,
+        word_length=lws.WORD_LENGTH,
+        stage_encoding=pcm.ONE_HOT,
+    ):
+        assert subsets.shape[1] == pcm.subset_width(
+            word_length, stage_encoding
+        )
+        self.word_length = word_length
+        self.stage_encoding = stage_encoding
+        self.packed_words = np.packbits(
+            subsets[:, :word_length].numpy().astype(np.uint8), axis=1
+        )
+
+    @classmethod
+    def from_packed(cls, packed_words, word_length, stage_encoding):
+        """
+        Rows of words already packed with np.packbits along each word.
+        """
+        expanded = cls.__new__(cls)
+        expanded.word_length = word_length
+        expanded.stage_encoding = stage_encoding
+        expanded.packed_words = packed_words
+        return expanded
+
+    def __len__(self):
+        return len(self.packed_words) * self.word_length
+
+    def words(self, subset_indices):
+        """
+        The words of the given subsets as float rows.
+        """
+        return torch.from_numpy(
+            np.unpackbits(
+                self.packed_words[torch.as_tensor(subset_indices).numpy()],
+                axis=1,
+                count=self.word_length,
+            )
+        ).float()
+
+    def rows(self, indices):
+        indices = torch.as_tensor(indices)
+        stages = indices % self.word_length
+        words = self.words(indices // self.word_length)
+        positions = torch.arange(self.word_length)
+        prefixes = words * (positions < stages.unsqueeze(1))
+        if self.stage_encoding == pcm.EMBEDDING:
+            stage_tracker = stages.float().unsqueeze(1)
+        else:
+            stage_tracker = (positions == stages.unsqueeze(1)).float()
+        truth = words.gather(1, stages.unsqueeze(1))
+        return torch.cat([prefixes, stage_tracker, truth], dim=1)
@@ -0,0 +1,282 @@
+"""
+Island model: several independent training runs (islands) in separate
+processes, each with its own model, optimizer and TrainingTracker.
+Every migration_interval loops each island sends its best words so far
+to the next island in a ring over a queue, and the receiver adds them
+to that loop's training elites. The coordinator prints a merged view
+of every island's progress and writes one top_examples.json of the
+best examples over all islands.
+"""
+
+import heapq
+import json
+import multiprocessing
+import queue
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import torch
+
+import pointconfig.model as pcm
+from pointconfig.checkpoint import checkpoint, load_checkpoint
+from pointconfig.expand_subset import ExpandedSubsets
+from pointconfig.lightweight_score import (
+    BATCH_SIZE,
+    PRIME,
+    DIMENSION,
+    get_context,
+)
+from pointconfig.plot import make_thresholds_and_data
+from pointconfig.replay_buffer import ReplayBuffer
+from pointconfig.train import best_from_model
+
+MIGRATION_INTERVAL = 10
+MIGRANTS = 10
+
+
+def run_islands(
+    num_islands,
+    output,
+    loops=5000,
+    migration_interval=MIGRATION_INTERVAL,
+    migrants=MIGRANTS,
+    top_examples=100,
+    prime=PRIME,
+    dimension=DIMENSION,
+    stage_encoding=pcm.ONE_HOT,
+    samples_per_loop=BATCH_SIZE,
+    elite_percentile=90,
+    checkpoint_every=50,
+    seed=0,
+):
+    """
+    Trains num_islands islands for loops loops, island k checkpointing
+    into output/island_k and seeded with seed + k. Returns the merged
+    top examples as (score, subset) pairs, best first, which are also
+    written to output/top_examples.json.
+    """
+    output = Path(output)
+    processes = multiprocessing.get_context("spawn")
+    inboxes = [processes.Queue() for _ in range(num_islands)]
+    reports = processes.Queue()
+    settings = {
+        "loops": loops,
+        "migration_interval": migration_interval,
+        "migrants": migrants,
+        "top_examples": top_examples,
+        "prime": prime,
+        "dimension": dimension,
+        "stage_encoding": stage_encoding,
+        "samples_per_loop": samples_per_loop,
+        "elite_percentile": elite_percentile,
+        "checkpoint_every": checkpoint_every,
+    }
+    islands = [
+        processes.Process(
+            target=_run_island,
+            args=(
+                island,
+                output / f"island_{island}",
+                seed + island,
+                inboxes[island],
+                inboxes[(island + 1) % num_islands],
+                reports,
+                settings,
+            ),
+        )
+        for island in range(num_islands)
+    ]
+    for process in islands:
+        process.start()
+    try:
+        island_examples = _follow_progress(islands, reports)
+    finally:
+        for process in islands:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    merged = merge_top_examples(island_examples, top_examples)
+    output.mkdir(parents=True, exist_ok=True)
+    with open(output / "top_examples.json", "w", encoding="utf8") as f:
+        json.dump(
+            {
+                i: {"score": score, "subset": subset}
+                for i, (score, subset) in enumerate(merged)
+            },
+            f,
+            indent=4,
+        )
+    return merged
+
+
+def merge_top_examples(island_examples, top_examples):
+    """
+    The top_examples best distinct (score, subset) pairs over the
+    islands' TrainingTracker.top_examples lists, best first.
+    """
+    best = {}
+    for examples in island_examples:
+        for score, subset in examples:
+            best[subset] = max(score, best.get(subset, score))
+    return heapq.nlargest(
+        top_examples, ((score, subset) for subset, score in best.items())
+    )
+
+
+def _follow_progress(islands, reports):
+    """
+    Prints each loop once every island has reported it and returns the
+    islands' top examples once they are all done.
+    """
+    num_islands = len(islands)
+    loop_reports = {}
+    island_examples = [None] * num_islands
+    while any(examples is None for examples in island_examples):
+        try:
+            report = reports.get(timeout=1)
+        except queue.Empty:
+            if any(process.exitcode for process in islands):
+                raise RuntimeError("an island failed") from None
+            continue
+        if report[0] == "done":
+            island_examples[report[1]] = report[2]
+            continue
+        _, island, loop_num, best_score, mean_score = report
+        loop_reports.setdefault(loop_num, {})[island] = (
+            best_score,
+            mean_score,
+        )
+        if len(loop_reports[loop_num]) == num_islands:
+            scores = loop_reports.pop(loop_num)
+            bests = [scores[island][0] for island in range(num_islands)]
+            means = [scores[island][1] for island in range(num_islands)]
+            print(
+                f"At {loop_num}, island bests: {bests}, "
+                f"island means: {[round(mean, 1) for mean in means]}, "
+                f"best overall: {max(bests)}"
+            )
+    return island_examples
+
+
+def _run_island(island, save_path, seed, inbox, outbox, reports, settings):
+    torch.manual_seed(seed)
+    loops = settings["loops"]
+    migration_interval = settings["migration_interval"]
+    save_path.mkdir(parents=True, exist_ok=True)
+    complete_model_info, training_tracker, _ = load_checkpoint(
+        None,
+        settings["top_examples"],
+        get_context(settings["prime"], settings["dimension"]),
+        settings["stage_encoding"],
+    )
+    model = complete_model_info["model"]
+    context = complete_model_info["context"]
+    stage_encoding = complete_model_info["stage_encoding"]
+    width = pcm.subset_width(context.word_length, stage_encoding)
+    threshold_data = make_thresholds_and_data(
+        context.prime, context.total_directions, context.dimension
+    )
+    # the island's best words so far, which are the ones sent out
+    emigrants = None
+    if settings["migrants"]:
+        emigrants = ReplayBuffer(settings["migrants"], context.word_length)
+    for loop_num in range(loops):
+        model.eval()
+        best_subsets, best_scores = best_from_model(
+            model,
+            settings["samples_per_loop"],
+            settings["elite_percentile"],
+            num_threads=1,
+            context=context,
+        )
+        training_tracker.update_best_examples(
+            best_subsets, best_scores, context
+        )
+        training_subsets = best_subsets
+        if emigrants is not None:
+            emigrants.add(best_subsets, best_scores, loop_num)
+        if emigrants is not None and (loop_num + 1) % migration_interval == 0:
+            outbox.put(emigrants.packed_words[: len(emigrants)].copy())
+            immigrants = np.unpackbits(
+                inbox.get(), axis=1, count=context.word_length
+            )
+            arrivals = torch.zeros((len(immigrants), width))
+            arrivals[:, : context.word_length] = torch.from_numpy(immigrants)
+            training_subsets = torch.cat([best_subsets, arrivals])
+
+        loss = pcm.train_model(
+            ExpandedSubsets(
+                training_subsets, context.word_length, stage_encoding
+            ),
+            model,
+            complete_model_info["loss_function"],
+            complete_model_info["optimizer"],
+        )
+        training_tracker.tracking_lists["loss"].append(loss)
+        training_tracker.update_lists(best_scores, threshold_data, loop_num)
+        reports.put(
+            (
+                "loop",
+                island,
+                loop_num + 1,
+                float(best_scores.max()),
+                float(best_scores.mean()),
+            )
+        )
+        if (loop_num + 1) % settings["checkpoint_every"] == 0:
+            checkpoint(
+                loop_num + 1,
+                complete_model_info,
+                training_tracker,
+                True,
+                save_path,
+            )
+    reports.put(
+        (
+            "done",
+            island,
+            [
+                (float(score), subset)
+                for score, subset in training_tracker.top_examples
+            ],
+        )
+    )
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--islands", type=int, required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--loops", type=int, default=5000)
+    parser.add_argument(
+        "--migration_interval", type=int, default=MIGRATION_INTERVAL
+    )
+    parser.add_argument("--migrants", type=int, default=MIGRANTS)
+    parser.add_argument("--prime", type=int, default=PRIME)
+    parser.add_argument("--dimension", type=int, default=DIMENSION)
+    parser.add_argument(
+        "--stage_encoding", choices=pcm.STAGE_ENCODINGS, default=pcm.ONE_HOT
+    )
+    parser.add_argument("--samples_per_loop", type=int, default=BATCH_SIZE)
+    parser.add_argument("--elite_percentile", type=float, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_islands(
+        args.islands,
+        args.output,
+        loops=args.loops,
+        migration_interval=args.migration_interval,
+        migrants=args.migrants,
+        prime=args.prime,
+        dimension=args.dimension,
+        stage_encoding=args.stage_encoding,
+        samples_per_loop=args.samples_per_loop,
+        elite_percentile=args.elite_percentile,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
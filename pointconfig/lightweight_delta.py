@@ -0,0 +1,234 @@
+import numpy as np
+from numba import njit
+
+import pointconfig.lightweight_heap as lwh
+import pointconfig.lightweight_score as lws
+
+
+class IncrementalScorer:
+    """
+    Keeps the plane and line incidence of a single subset so that adding
+    or removing a point touches only one plane and one line cell per
+    direction instead of rescoring the whole word. Per direction min and
+    max heaps of the plane incidences keep the equidistribution term
+    current in O(log p). Scores agree with ScoringContext.score_word for
+    the same subset.
+    """
+
+    def __init__(self, context=None, word=None):
+        if context is None:
+            context = lws.DEFAULT_CONTEXT
+        self.context = context
+        prime = context.prime
+        total_directions = context.total_directions
+        total_line_intercepts = context.total_line_intercepts
+
+        self.points = np.zeros(context.total_points, dtype=np.uint8)
+        self.size = 0
+        self.plane_incidence = np.zeros(
+            (total_directions, context.total_plane_intercepts),
+            dtype=np.int64,
+        )
+        self.line_incidence = np.zeros(
+            (total_directions, total_line_intercepts), dtype=np.int64
+        )
+        # how many line cells hold each incidence, a line has prime points
+        self.line_value_counts = np.zeros(prime + 1, dtype=np.int64)
+        self.line_value_counts[0] = total_directions * total_line_intercepts
+        self.min_heap_pairs, self.min_heap_positions = lwh.make_heap(
+            total_directions, prime
+        )
+        self.max_heap_pairs, self.max_heap_positions = lwh.make_heap(
+            total_directions, prime
+        )
+        # running plane score, number of planes over the limit and
+        # equidistribution score (every direction starts out even)
+        self.plane_totals = np.array(
+            [
+                total_directions * prime * total_line_intercepts,
+                0,
+                total_directions * prime * total_directions,
+            ],
+            dtype=np.int64,
+        )
+
+        for fixed_index in context.fixed_indices:
+            self.add_point(fixed_index)
+        if word is not None:
+            self.set_word(word)
+
+    @property
+    def word(self):
+        return self.points[self.context.valid_indices]
+
+    def add_point(self, point_index):
+        """
+        Adds the point with the given ambient index, if it is not in yet.
+        """
+        if self.points[point_index]:
+            return
+        self._move_point(point_index, 1)
+
+    def remove_point(self, point_index):
+        """
+        Removes the point with the given ambient index.
+        """
+        if point_index in self.context.fixed_indices:
+            raise ValueError("Fixed points cannot be removed.")
+        if not self.points[point_index]:
+            raise KeyError("Point is not in the subset.")
+        self._move_point(point_index, -1)
+
+    def flip(self, position):
+        """
+        Toggles position of the word (not the ambient index)
+        and returns the new score.
+        """
+        point_index = self.context.valid_indices[position]
+        if self.points[point_index]:
+            self.remove_point(point_index)
+        else:
+            self.add_point(point_index)
+        return self.score()
+
+    def set_word(self, word):
+        """
+        Moves to the subset given by word, flipping only the differences.
+        """
+        for position in np.flatnonzero(self.word != word[: len(self.word)]):
+            point_index = self.context.valid_indices[position]
+            if self.points[point_index]:
+                self.remove_point(point_index)
+            else:
+                self.add_point(point_index)
+
+    def score(self):
+        return _incremental_score(
+            self.size,
+            self.context.prime,
+            self.line_value_counts,
+            self.plane_totals,
+        )
+
+    def _move_point(self, point_index, step):
+        _move_point(
+            point_index,
+            step,
+            self.context.prime,
+            self.context.tables,
+            self.plane_incidence,
+            self.line_incidence,
+            self.line_value_counts,
+            self.plane_totals,
+            self.min_heap_pairs,
+            self.min_heap_positions,
+            self.max_heap_pairs,
+            self.max_heap_positions,
+        )
+        self.points[point_index] = step > 0
+        self.size += step
+
+
+@njit(cache=True)
+def _plane_cell_score(incidence, prime, total_line_intercepts):
+    if incidence <= prime:
+        return total_line_intercepts
+    return total_line_intercepts - incidence
+
+
+@njit(cache=True)
+def _move_point(
+    point_index,
+    step,
+    prime,
+    tables,
+    plane_incidence,
+    line_incidence,
+    line_value_counts,
+    plane_totals,
+    min_heap_pairs,
+    min_heap_positions,
+    max_heap_pairs,
+    max_heap_positions,
+):
+    dimension, plane_lookup, line_lookup = tables[:3]
+    total_directions, total_line_intercepts = line_incidence.shape
+    for direction_index in range(total_directions):
+        # planes
+        plane_intercept = lws._plane_intercept(
+            prime, dimension, plane_lookup, point_index, direction_index
+        )
+        old = plane_incidence[direction_index, plane_intercept]
+        new = old + step
+        plane_incidence[direction_index, plane_intercept] = new
+        plane_totals[0] += _plane_cell_score(
+            new, prime, total_line_intercepts
+        ) - _plane_cell_score(old, prime, total_line_intercepts)
+        plane_totals[1] += int(new > prime) - int(old > prime)
+
+        # equidistribution
+        plane_totals[2] -= lws._equidistribution_contribution(
+            lwh.plane_spread(direction_index, min_heap_pairs, max_heap_pairs),
+            prime,
+            total_directions,
+        )
+        if step > 0:
+            lwh.increment_both(
+                prime,
+                direction_index,
+                plane_intercept,
+                min_heap_pairs,
+                min_heap_positions,
+                max_heap_pairs,
+                max_heap_positions,
+            )
+        else:
+            lwh.decrement_both(
+                prime,
+                direction_index,
+                plane_intercept,
+                min_heap_pairs,
+                min_heap_positions,
+                max_heap_pairs,
+                max_heap_positions,
+            )
+        plane_totals[2] += lws._equidistribution_contribution(
+            lwh.plane_spread(direction_index, min_heap_pairs, max_heap_pairs),
+            prime,
+            total_directions,
+        )
+
+        # lines
+        line_intercept = lws._line_intercept(
+            prime, dimension, line_lookup, point_index, direction_index
+        )
+        old = line_incidence[direction_index, line_intercept]
+        line_incidence[direction_index, line_intercept] = old + step
+        line_value_counts[old] -= 1
+        line_value_counts[old + step] += 1
+
+
+@njit(cache=True)
+def _incremental_score(size, prime, line_value_counts, plane_totals):
+    score, size_pass, multiple = lws._size_scoring_from_size(size, prime)
+    if not size_pass:
+        return score
+    line_threshold = min(multiple, prime - multiple)
+
+    score += plane_totals[0]
+    if plane_totals[1] > 0:
+        return score
+
+    # the line threshold moves with the size, so lines are scored from
+    # the histogram of incidences rather than a running total
+    line_passed = True
+    for incidence in range(len(line_value_counts)):
+        count = line_value_counts[incidence]
+        if incidence <= line_threshold:
+            score += count * prime
+        elif count > 0:
+            line_passed = False
+            score += count * (prime - incidence)
+    if not line_passed:
+        return score
+    return score + plane_totals[2]
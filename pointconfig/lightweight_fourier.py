@@ -0,0 +1,98 @@
+"""
+Batched Fourier engine for plane equidistribution.
+
+The number of points of a subset on the plane x . xi = c, over all c, is
+the inverse DFT along k of the subset's Fourier coefficients at k * xi.
+So one d-dimensional FFT of the indicator gives the plane counts for
+every normal direction at once, and the subset is equidistributed along
+xi exactly when the coefficients at the nonzero multiples of xi vanish.
+"""
+
+import numpy as np
+
+import pointconfig.lightweight_score as lws
+from pointconfig.lightweight_utils import index_to_direction
+
+_FREQUENCY_INDICES = {}
+
+
+def frequency_indices(prime, dimension):
+    """
+    (directions, prime) array, entry [direction, k] is the flat index of
+    the frequency k * direction in the p^d grid. Directions are ordered
+    as in the lookup tables (index_to_direction). Cached per pair.
+    """
+    key = (prime, dimension)
+    if key not in _FREQUENCY_INDICES:
+        total_directions = ((prime**dimension) - 1) // (prime - 1)
+        place_values = prime ** np.arange(dimension - 1, -1, -1)
+        multiples = np.arange(prime)
+        indices = np.empty((total_directions, prime), dtype=np.int64)
+        for direction_index in range(total_directions):
+            direction = index_to_direction(
+                prime, dimension, direction_index
+            ).astype(np.int64)
+            frequencies = np.outer(multiples, direction) % prime
+            indices[direction_index] = frequencies @ place_values
+        _FREQUENCY_INDICES[key] = indices
+    return _FREQUENCY_INDICES[key]
+
+
+def true_words_from_words(words, context=None):
+    """
+    Vectorized true_word_from_word, adds the fixed points to a batch.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    true_words = np.zeros((len(words), context.total_points), dtype=np.uint8)
+    true_words[:, context.fixed_indices] = 1
+    true_words[:, context.valid_indices] = words[:, : context.word_length]
+    return true_words
+
+
+def plane_counts(true_words, prime, dimension, chunk_size=1024):
+    """
+    Points on each plane for a batch of true words (indicators over all
+    p^d points), shape (words, directions, prime).
+    """
+    true_words = np.asarray(true_words)
+    indices = frequency_indices(prime, dimension)
+    counts = np.empty((len(true_words),) + indices.shape, dtype=np.int64)
+    grid = (prime,) * dimension
+    axes = tuple(range(1, dimension + 1))
+    for start in range(0, len(true_words), chunk_size):
+        chunk = true_words[start : start + chunk_size]
+        spectrum = np.fft.fftn(
+            chunk.reshape((len(chunk),) + grid).astype(np.float64),
+            axes=axes,
+        ).reshape(len(chunk), -1)
+        along_directions = spectrum[:, indices]
+        counts[start : start + chunk_size] = np.rint(
+            np.fft.ifft(along_directions, axis=-1).real
+        )
+    return counts
+
+
+def equidistribution(true_words, prime, dimension, chunk_size=1024):
+    """
+    Returns (mask, counts): mask[word, direction] is True when the word
+    is equidistributed over the planes normal to the direction, counts
+    are the plane counts from plane_counts.
+    """
+    counts = plane_counts(true_words, prime, dimension, chunk_size)
+    mask = counts.min(axis=-1) == counts.max(axis=-1)
+    return mask, counts
+
+
+def equidistribution_from_words(words, context=None, chunk_size=1024):
+    """
+    equidistribution for a batch of words (fixed points left out).
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    return equidistribution(
+        true_words_from_words(words, context),
+        context.prime,
+        context.dimension,
+        chunk_size,
+    )
@@ -1,58 +1,165 @@
 import numpy as np
 from numba import njit
 
+# Indexed binary heaps of plane incidences, one heap per normal direction.
+# heap_pairs[direction, position] holds (incidence, plane) and
+# heap_positions[direction, plane] is where that plane sits in the heap.
+# The heaps are min-heaps; the max side stores negated incidences.
 
-@njit
+
+@njit(cache=True)
+def make_heap(total_directions, prime):
+    heap_pairs = np.zeros((total_directions, prime, 2), dtype=np.int64)
+    heap_positions = np.empty((total_directions, prime), dtype=np.int64)
+    for normal_direction in range(total_directions):
+        for plane in range(prime):
+            heap_pairs[normal_direction, plane, 1] = plane
+            heap_positions[normal_direction, plane] = plane
+    return heap_pairs, heap_positions
+
+
+@njit(cache=True)
+def _swap(
+    normal_direction, position_0, position_1, heap_pairs, heap_positions
+):
+    plane_0 = heap_pairs[normal_direction, position_0, 1]
+    plane_1 = heap_pairs[normal_direction, position_1, 1]
+
+    # swap heap entries
+    tmp0 = heap_pairs[normal_direction, position_0, 0]
+    heap_pairs[normal_direction, position_0, 0] = heap_pairs[
+        normal_direction, position_1, 0
+    ]
+    heap_pairs[normal_direction, position_0, 1] = plane_1
+    heap_pairs[normal_direction, position_1, 0] = tmp0
+    heap_pairs[normal_direction, position_1, 1] = plane_0
+
+    # swap location in position tracker
+    heap_positions[normal_direction, plane_0] = position_1
+    heap_positions[normal_direction, plane_1] = position_0
+
+
+@njit(cache=True)
 def sift_heap(prime, normal_direction, plane, heap_pairs, heap_positions):
+    """Moves plane down until neither child is smaller"""
     while True:
-        print(heap_pairs)
-        print(heap_positions)
         plane_heap_position = heap_positions[normal_direction, plane]
-        parent_0_position = (plane_heap_position * 2) + 1
-        parent_1_position = (plane_heap_position * 2) + 2
-        if parent_0_position > prime - 1:
+        child_0_position = (plane_heap_position * 2) + 1
+        child_1_position = (plane_heap_position * 2) + 2
+        if child_0_position > prime - 1:
             return
-        if parent_1_position > prime - 1:
-            min_parent_position = parent_0_position
+        if child_1_position > prime - 1:
+            min_child_position = child_0_position
         else:
-            parent_0_value = heap_pairs[normal_direction, parent_0_position, 0]
-            parent_1_value = heap_pairs[normal_direction, parent_1_position, 0]
-            if parent_0_value <= parent_1_value:
-                min_parent_position = parent_0_position
+            child_0_value = heap_pairs[normal_direction, child_0_position, 0]
+            child_1_value = heap_pairs[normal_direction, child_1_position, 0]
+            if child_0_value <= child_1_value:
+                min_child_position = child_0_position
             else:
-                min_parent_position = parent_1_position
+                min_child_position = child_1_position
 
         if (
             heap_pairs[normal_direction, plane_heap_position, 0]
-            <= heap_pairs[normal_direction, min_parent_position, 0]
+            <= heap_pairs[normal_direction, min_child_position, 0]
         ):
             return
+        _swap(
+            normal_direction,
+            plane_heap_position,
+            min_child_position,
+            heap_pairs,
+            heap_positions,
+        )
 
-        min_parent_plane = heap_pairs[normal_direction, min_parent_position, 1]
-        print(min_parent_plane)
 
-        # swap heap entries
-        tmp0 = heap_pairs[normal_direction, plane_heap_position, 0]
-        tmp1 = heap_pairs[normal_direction, plane_heap_position, 1]
-        heap_pairs[normal_direction, plane_heap_position, 0] = heap_pairs[
-            normal_direction, min_parent_position, 0
-        ]
-        heap_pairs[normal_direction, plane_heap_position, 1] = heap_pairs[
-            normal_direction, min_parent_position, 1
-        ]
-        heap_pairs[normal_direction, min_parent_position, 0] = tmp0
-        heap_pairs[normal_direction, min_parent_position, 1] = tmp1
-
-        # swap location in position tracker
-        tmp = heap_positions[normal_direction, plane]
-        heap_positions[normal_direction, plane] = min_parent_position
-        heap_positions[normal_direction, int(min_parent_plane)] = tmp
+@njit(cache=True)
+def sift_up(normal_direction, plane, heap_pairs, heap_positions):
+    """Moves plane up until its parent is no larger"""
+    while True:
+        plane_heap_position = heap_positions[normal_direction, plane]
+        if plane_heap_position == 0:
+            return
+        parent_position = (plane_heap_position - 1) // 2
+        if (
+            heap_pairs[normal_direction, parent_position, 0]
+            <= heap_pairs[normal_direction, plane_heap_position, 0]
+        ):
+            return
+        _swap(
+            normal_direction,
+            plane_heap_position,
+            parent_position,
+            heap_pairs,
+            heap_positions,
+        )
 
 
-@njit
+@njit(cache=True)
 def increment_plane(
     prime, normal_direction, plane, heap_pairs, heap_positions
 ):
     plane_position = heap_positions[normal_direction, plane]
     heap_pairs[normal_direction, plane_position, 0] += 1
-    sift_heap(prime, plane, heap_pairs, heap_positions)
+    sift_heap(prime, normal_direction, plane, heap_pairs, heap_positions)
+
+
+@njit(cache=True)
+def decrement_plane(normal_direction, plane, heap_pairs, heap_positions):
+    plane_position = heap_positions[normal_direction, plane]
+    heap_pairs[normal_direction, plane_position, 0] -= 1
+    sift_up(normal_direction, plane, heap_pairs, heap_positions)
+
+
+@njit(cache=True)
+def peek_min(normal_direction, heap_pairs):
+    return heap_pairs[normal_direction, 0, 0]
+
+
+@njit(cache=True)
+def peek_max(normal_direction, max_heap_pairs):
+    return -max_heap_pairs[normal_direction, 0, 0]
+
+
+@njit(cache=True)
+def increment_both(
+    prime,
+    normal_direction,
+    plane,
+    min_heap_pairs,
+    min_heap_positions,
+    max_heap_pairs,
+    max_heap_positions,
+):
+    increment_plane(
+        prime, normal_direction, plane, min_heap_pairs, min_heap_positions
+    )
+    # negated incidence goes down in the max heap
+    decrement_plane(
+        normal_direction, plane, max_heap_pairs, max_heap_positions
+    )
+
+
+@njit(cache=True)
+def decrement_both(
+    prime,
+    normal_direction,
+    plane,
+    min_heap_pairs,
+    min_heap_positions,
+    max_heap_pairs,
+    max_heap_positions,
+):
+    decrement_plane(
+        normal_direction, plane, min_heap_pairs, min_heap_positions
+    )
+    increment_plane(
+        prime, normal_direction, plane, max_heap_pairs, max_heap_positions
+    )
+
+
+@njit(cache=True)
+def plane_spread(normal_direction, min_heap_pairs, max_heap_pairs):
+    """Most minus fewest points on a plane normal to the direction"""
+    return peek_max(normal_direction, max_heap_pairs) - peek_min(
+        normal_direction, min_heap_pairs
+    )
@@ -1,106 +1,744 @@
+import numba
 import numpy as np
-from numba import njit
+from numba import njit, prange
 import pointconfig.lightweight_utils as lwu
+from pointconfig.lookup_cache import load_lookup
 
 PRIME = 11
 DIMENSION = 3
-plane_lookup_maker = lwu.plane_lookup_factory(PRIME, DIMENSION)
-PLANE_LOOKUP = plane_lookup_maker()
-line_lookup_maker = lwu.line_lookup_factory(PRIME, DIMENSION)
-LINE_LOOKUP = line_lookup_maker()
-TOTAL_POINTS = PRIME**3
-WORD_LENGTH = TOTAL_POINTS - 4
-TOTAL_DIRECTIONS = ((PRIME**DIMENSION) - 1) // (PRIME - 1)
-TOTAL_PLANE_INTERCEPTS = PRIME
-TOTAL_LINE_INTERCEPTS = PRIME**2
-
-FIXED_INDICES = {0, 1, PRIME, PRIME**2}
-VALID_INDICES = np.array(
-    [i for i in range(TOTAL_POINTS) if i not in FIXED_INDICES]
-)
-
 BATCH_SIZE = 1000
+# above this many bytes of lookup tables intercepts are computed instead
+LOOKUP_MEMORY_BUDGET = 1 << 30
+# incidence arrays of one block of words should fit in this much cache
+L2_CACHE_BYTES = 1 << 20
+
+
+class ScoringContext:
+    """
+    Lookup tables, sizes and scoring entry points for one
+    (prime, dimension) pair. Build these with get_context so each
+    pair is only built once per process. The njit kernels take the
+    tables as arguments, so they compile once and serve every context.
+
+    When the lookups would take more than memory_budget bytes they are
+    not built (plane_lookup and line_lookup are None) and the kernels
+    compute each intercept from the point and direction indices instead.
+    """
+
+    def __init__(self, prime, dimension, memory_budget=None):
+        self.prime = prime
+        self.dimension = dimension
+        self.total_points = prime**dimension
+        self.total_directions = ((prime**dimension) - 1) // (prime - 1)
+        self.total_plane_intercepts = prime
+        self.total_line_intercepts = prime ** (dimension - 1)
+
+        # the origin and the standard basis are always in the subset
+        self.fixed_indices = np.array(
+            [0] + [prime**power for power in range(dimension)]
+        )
+        fixed = set(self.fixed_indices.tolist())
+        self.valid_indices = np.array(
+            [i for i in range(self.total_points) if i not in fixed]
+        )
+        self.word_length = self.total_points - len(fixed)
+
+        # incidences count up to the points on a plane or line
+        self.plane_incidence_dtype = lwu.smallest_uint(
+            self.total_points // prime
+        )
+        self.line_incidence_dtype = lwu.smallest_uint(prime)
+
+        if memory_budget is None:
+            memory_budget = LOOKUP_MEMORY_BUDGET
+        self.uses_lookup = self.lookup_bytes() <= memory_budget
+        if self.uses_lookup:
+            self.plane_lookup = load_lookup(
+                "plane", prime, dimension, lwu.make_plane_lookup
+            )
+            self.line_lookup = load_lookup(
+                "line", prime, dimension, lwu.make_line_lookup
+            )
+        else:
+            self.plane_lookup = None
+            self.line_lookup = None
+        # what the kernels need besides the prime, the empty arrays only
+        # carry the incidence dtypes into njit code
+        self.tables = (
+            dimension,
+            self.plane_lookup,
+            self.line_lookup,
+            np.empty(0, dtype=self.plane_incidence_dtype),
+            np.empty(0, dtype=self.line_incidence_dtype),
+        )
+
+    def lookup_bytes(self):
+        """
+        Combined size of the plane and line lookups.
+        """
+        entry_bytes = (
+            np.dtype(lwu.smallest_uint(self.prime - 1)).itemsize
+            + np.dtype(
+                lwu.smallest_uint(self.total_line_intercepts - 1)
+            ).itemsize
+        )
+        return self.total_points * self.total_directions * entry_bytes
+
+    def score_thresholds(self):
+        return score_thresholds(self.prime, self.dimension)
+
+    def true_word_from_word(self, word):
+        return _true_word_from_word(
+            word, self.total_points, self.fixed_indices, self.valid_indices
+        )
+
+    def score_word(self, word):
+        return _score_word(
+            word,
+            self.prime,
+            self.tables,
+            self.fixed_indices,
+            self.valid_indices,
+        )
+
+    def score_positions(self, positions):
+        """
+        Scores the word whose ones sit at the given word positions.
+        """
+        return _score_points(
+            _points_from_positions(
+                positions, self.fixed_indices, self.valid_indices
+            ),
+            self.prime,
+            self.tables,
+        )
+
+    def score_words(self, words, positions=False):
+        """
+        Scores a 2d array (or tensor, or list) of dense words, or with
+        positions=True a sequence of arrays of word positions (see
+        pack_positions). Input not of the stated form raises ValueError.
+        """
+        if not positions:
+            return _score_words(
+                _dense_words(words, self.word_length),
+                self.prime,
+                self.tables,
+                self.fixed_indices,
+                self.valid_indices,
+            )
+        positions, offsets = _packed_positions(words, self.word_length)
+        return _score_position_lists(
+            positions,
+            offsets,
+            self.prime,
+            self.tables,
+            self.fixed_indices,
+            self.valid_indices,
+        )
+
+    def score_words_parallel(self, words, num_threads=None, positions=False):
+        """
+        Scores a batch of any size with the score_word kernel, splitting
+        the words across num_threads cores (all available by default).
+        Takes dense words or position lists, like score_words.
+        """
+        if num_threads is None:
+            num_threads = numba.config.NUMBA_NUM_THREADS
+        previous_num_threads = numba.get_num_threads()
+        numba.set_num_threads(num_threads)
+        try:
+            if not positions:
+                return _score_words_parallel(
+                    _dense_words(words, self.word_length),
+                    self.prime,
+                    self.tables,
+                    self.fixed_indices,
+                    self.valid_indices,
+                )
+            positions, offsets = _packed_positions(words, self.word_length)
+            return _score_position_lists_parallel(
+                positions,
+                offsets,
+                self.prime,
+                self.tables,
+                self.fixed_indices,
+                self.valid_indices,
+            )
+        finally:
+            numba.set_num_threads(previous_num_threads)
+
+    def block_size(self):
+        """
+        Words per block so a block's incidence arrays fit in L2.
+        """
+        incidence_bytes = self.total_directions * (
+            self.total_plane_intercepts
+            * np.dtype(self.plane_incidence_dtype).itemsize
+            + self.total_line_intercepts
+            * np.dtype(self.line_incidence_dtype).itemsize
+        )
+        return max(1, L2_CACHE_BYTES // incidence_bytes)
+
+    def score_words_blocked(
+        self, words, block_size=None, num_threads=None, positions=False
+    ):
+        """
+        Scores a batch point-major: each lookup row is read once per block
+        of words and scattered into the incidence of every word in the
+        block holding that point. The lookups stay point-major (a point's
+        directions are one contiguous row), which is the order streamed
+        here. Only words passing the size section, which needs no
+        lookups, are blocked. Blocks are split across num_threads cores.
+        Takes dense words or position lists, like score_words. With
+        num_threads=1 no numba parallel region is started, so it is safe
+        to call from several Python threads at once (the kernels release
+        the GIL).
+        """
+        if num_threads is None:
+            num_threads = numba.config.NUMBA_NUM_THREADS
+        if not positions:
+            words = _dense_words(words, self.word_length)
+            sizes = words.sum(axis=1, dtype=np.int64)
+        else:
+            packed, offsets = _packed_positions(words, self.word_length)
+            sizes = np.diff(offsets)
+        # most words of a young model fail the size section, which needs
+        # no lookups, so only the words passing it are blocked
+        scores, passed = _size_scores(
+            sizes + len(self.fixed_indices), self.prime
+        )
+        if not passed.any():
+            return scores
+        if not positions:
+            packed, offsets = dense_to_positions(
+                words[passed], self.word_length
+            )
+        else:
+            packed = packed[np.repeat(passed, sizes)]
+            offsets = np.zeros(np.count_nonzero(passed) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(sizes[passed])
+        scores[passed] = self._score_blocked(
+            packed, offsets, block_size, num_threads
+        )
+        return scores
+
+    def _score_blocked(self, positions, offsets, block_size, num_threads):
+        if block_size is None:
+            # at least one block per thread
+            per_thread = -(-(len(offsets) - 1) // num_threads)
+            block_size = max(1, min(self.block_size(), per_thread))
+        if num_threads == 1:
+            return _score_blocks_serial(
+                positions,
+                offsets,
+                block_size,
+                self.prime,
+                self.tables,
+                self.fixed_indices,
+                self.valid_indices,
+            )
+        previous_num_threads = numba.get_num_threads()
+        numba.set_num_threads(num_threads)
+        try:
+            return _score_blocks(
+                positions,
+                offsets,
+                block_size,
+                self.prime,
+                self.tables,
+                self.fixed_indices,
+                self.valid_indices,
+            )
+        finally:
+            numba.set_num_threads(previous_num_threads)
+
+
+_CONTEXTS = {}
+
+
+def get_context(prime=PRIME, dimension=DIMENSION):
+    """
+    Returns the shared ScoringContext for (prime, dimension),
+    building it the first time the pair is asked for.
+    """
+    key = (prime, dimension)
+    if key not in _CONTEXTS:
+        _CONTEXTS[key] = ScoringContext(prime, dimension)
+    return _CONTEXTS[key]
 
 
-def score_thresholds(PRIME):
+# The default field, kept at module level for existing callers
+DEFAULT_CONTEXT = get_context(PRIME, DIMENSION)
+PLANE_LOOKUP = DEFAULT_CONTEXT.plane_lookup
+LINE_LOOKUP = DEFAULT_CONTEXT.line_lookup
+TOTAL_POINTS = DEFAULT_CONTEXT.total_points
+WORD_LENGTH = DEFAULT_CONTEXT.word_length
+TOTAL_DIRECTIONS = DEFAULT_CONTEXT.total_directions
+TOTAL_PLANE_INTERCEPTS = DEFAULT_CONTEXT.total_plane_intercepts
+TOTAL_LINE_INTERCEPTS = DEFAULT_CONTEXT.total_line_intercepts
+
+FIXED_INDICES = set(DEFAULT_CONTEXT.fixed_indices.tolist())
+VALID_INDICES = DEFAULT_CONTEXT.valid_indices
+
+
+def score_thresholds(PRIME, DIMENSION=DIMENSION):
+    total_directions = ((PRIME**DIMENSION) - 1) // (PRIME - 1)
+    total_line_intercepts = PRIME ** (DIMENSION - 1)
     thresholds = {}
     score = 0
     score += PRIME
     thresholds[score] = f"Size a multiple of {PRIME}"
     score += PRIME**2
     thresholds[score] = "Size multiple lies in the correct range"
-    score += (1 + PRIME + (PRIME**2)) * (PRIME**2)
+    score += total_directions * total_line_intercepts
     thresholds[score] = f"All planes have {PRIME} or fewer points"
-    score += (1 + PRIME + (PRIME**2)) * (PRIME**2) * (PRIME)
+    score += total_directions * total_line_intercepts * (PRIME)
     thresholds[score] = "No line contains too many points"
     return thresholds
 
 
-@njit()
+def pack_positions(position_lists):
+    """
+    Flattens a sequence of word position arrays into one array plus
+    offsets, so the ith word has positions[offsets[i]:offsets[i + 1]].
+    """
+    offsets = np.zeros(len(position_lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(positions) for positions in position_lists])
+    if not len(position_lists):
+        return np.empty(0, dtype=np.int64), offsets
+    positions = np.concatenate(position_lists).astype(np.int64, copy=False)
+    return positions, offsets
+
+
+def dense_to_positions(words, word_length=WORD_LENGTH):
+    """
+    Packed positions and offsets (as in pack_positions) of dense words.
+    """
+    rows, positions = np.nonzero(words[:, :word_length])
+    offsets = np.zeros(len(words) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(rows, minlength=len(words)))
+    return positions.astype(np.int64), offsets
+
+
+def _dense_words(words, word_length):
+    """
+    words as a uint8 array of 0/1 rows of length word_length.
+    """
+    words = np.asarray(words)
+    if words.ndim != 2 or words.shape[1] != word_length:
+        raise ValueError(
+            f"dense words must have shape (n, {word_length}), "
+            f"got {words.shape}"
+        )
+    if ((words != 0) & (words != 1)).any():
+        raise ValueError("dense words must only hold 0 and 1")
+    return words.astype(np.uint8, copy=False)
+
+
+def _packed_positions(position_lists, word_length):
+    """
+    pack_positions of position_lists, which must lie in [0, word_length).
+    """
+    positions, offsets = pack_positions(position_lists)
+    if len(positions) and (
+        positions.min() < 0 or positions.max() >= word_length
+    ):
+        raise ValueError(f"word positions must lie in [0, {word_length})")
+    return positions, offsets
+
+
 def score_word(word):
-    score, size_pass, multiple = _size_scoring(word, PRIME)
+    return DEFAULT_CONTEXT.score_word(word)
+
+
+def score_words(words, positions=False):
+    return DEFAULT_CONTEXT.score_words(words, positions)
+
+
+def score_words_parallel(words, num_threads=None, positions=False):
+    return DEFAULT_CONTEXT.score_words_parallel(words, num_threads, positions)
+
+
+@njit(cache=True)
+def _score_word(word, prime, tables, fixed_indices, valid_indices):
+    points = _points_from_word(word, fixed_indices, valid_indices)
+    return _score_points(points, prime, tables)
+
+
+@njit(cache=True)
+def _points_from_word(word, fixed_indices, valid_indices):
+    num_fixed = len(fixed_indices)
+    size = num_fixed
+    for position in range(len(valid_indices)):
+        if word[position] != 0:
+            size += 1
+    points = np.empty(size, dtype=np.int64)
+    points[:num_fixed] = fixed_indices
+    point_number = num_fixed
+    for position in range(len(valid_indices)):
+        if word[position] != 0:
+            points[point_number] = valid_indices[position]
+            point_number += 1
+    return points
+
+
+@njit(cache=True)
+def _points_from_positions(positions, fixed_indices, valid_indices):
+    num_fixed = len(fixed_indices)
+    points = np.empty(num_fixed + len(positions), dtype=np.int64)
+    points[:num_fixed] = fixed_indices
+    for point_number in range(len(positions)):
+        points[num_fixed + point_number] = valid_indices[
+            positions[point_number]
+        ]
+    return points
+
+
+@njit(cache=True)
+def _score_points(points, prime, tables):
+    """Scores the subset given by its ambient point indices"""
+    score, size_pass, multiple = _size_scoring_from_size(len(points), prime)
     if not size_pass:
         return score
-    line_threshold = min(multiple, PRIME - multiple)
+    line_threshold = min(multiple, prime - multiple)
+    dimension, plane_lookup, line_lookup, plane_type, line_type = tables
+    total_points = prime**dimension
+    total_directions = (total_points - 1) // (prime - 1)
 
     # incidence trackers
     # lines
-    line_incidence, directions_determined = _get_line_incidence_structures()
+    line_incidence, directions_determined = _get_line_incidence_structures(
+        total_directions, total_points // prime, line_type
+    )
     # planes
     (
         plane_incidence,
         plane_equidistribution,
-    ) = _get_plane_incidence_strutures()
-
-    # add in the points that are always there
-    true_word = _true_word_from_word(word)
+    ) = _get_plane_incidence_strutures(total_directions, prime, plane_type)
 
-    for point_index in range(TOTAL_POINTS):
-        if true_word[point_index] == 0:
-            continue
-        for direction_index in range(TOTAL_DIRECTIONS):
-            # planes
+    # planes first, most samples fail here and never need their lines
+    for point_index in points:
+        for direction_index in range(total_directions):
             _update_plane_structures(
+                prime,
+                dimension,
+                plane_lookup,
                 point_index,
                 direction_index,
                 plane_incidence,
                 plane_equidistribution,
                 multiple,
             )
+    plane_score, plane_passed = _score_planes(
+        prime, plane_incidence, total_points // prime
+    )
+    score += plane_score
+    if not plane_passed:
+        return score
 
-            # lines
+    # lines
+    for point_index in points:
+        for direction_index in range(total_directions):
             _update_line_structures(
+                prime,
+                dimension,
+                line_lookup,
                 point_index,
                 direction_index,
                 line_incidence,
                 directions_determined,
             )
-
-    # score planes
-    score += _score_incidence(
-        plane_incidence,
-        line_incidence,
-        line_threshold,
+    line_score, line_passed = _score_lines(
+        prime, line_incidence, line_threshold
     )
-    return score
+    score += line_score
+    if not line_passed:
+        return score
+    return score + _score_equidistribution(prime, plane_incidence)
 
 
-@njit()
-def score_words(words):
-    assert BATCH_SIZE == len(words)
+@njit(cache=True, nogil=True)
+def _score_words(words, prime, tables, fixed_indices, valid_indices):
     # work out the dtype here, have to
-    scores = np.empty(BATCH_SIZE)
-    for word_index in range(BATCH_SIZE):
-        # if word_index % 100 == 0:
-        #    print(f"Scored {word_index + 1} words")
-        scores[word_index] = score_word(words[word_index, :])
+    scores = np.empty(len(words))
+    for word_index in range(len(words)):
+        scores[word_index] = _score_word(
+            words[word_index, :],
+            prime,
+            tables,
+            fixed_indices,
+            valid_indices,
+        )
+    return scores
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _score_words_parallel(words, prime, tables, fixed_indices, valid_indices):
+    scores = np.empty(len(words))
+    for word_index in prange(len(words)):
+        scores[word_index] = _score_word(
+            words[word_index, :],
+            prime,
+            tables,
+            fixed_indices,
+            valid_indices,
+        )
+    return scores
+
+
+@njit(cache=True, nogil=True)
+def _score_position_lists(
+    positions,
+    offsets,
+    prime,
+    tables,
+    fixed_indices,
+    valid_indices,
+):
+    scores = np.empty(len(offsets) - 1)
+    for word_index in range(len(offsets) - 1):
+        points = _points_from_positions(
+            positions[offsets[word_index] : offsets[word_index + 1]],
+            fixed_indices,
+            valid_indices,
+        )
+        scores[word_index] = _score_points(points, prime, tables)
     return scores
 
 
-@njit()
-def _size_scoring(word, prime):
+@njit(parallel=True, cache=True, nogil=True)
+def _score_position_lists_parallel(
+    positions,
+    offsets,
+    prime,
+    tables,
+    fixed_indices,
+    valid_indices,
+):
+    scores = np.empty(len(offsets) - 1)
+    for word_index in prange(len(offsets) - 1):
+        points = _points_from_positions(
+            positions[offsets[word_index] : offsets[word_index + 1]],
+            fixed_indices,
+            valid_indices,
+        )
+        scores[word_index] = _score_points(points, prime, tables)
+    return scores
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _score_blocks(
+    positions,
+    offsets,
+    block_size,
+    prime,
+    tables,
+    fixed_indices,
+    valid_indices,
+):
+    num_words = len(offsets) - 1
+    scores = np.empty(num_words)
+    num_blocks = (num_words + block_size - 1) // block_size
+    for block in prange(num_blocks):
+        start = block * block_size
+        end = min(start + block_size, num_words)
+        _score_block(
+            positions,
+            offsets,
+            start,
+            end,
+            scores,
+            prime,
+            tables,
+            fixed_indices,
+            valid_indices,
+        )
+    return scores
+
+
+@njit(cache=True, nogil=True)
+def _score_blocks_serial(
+    positions,
+    offsets,
+    block_size,
+    prime,
+    tables,
+    fixed_indices,
+    valid_indices,
+):
+    num_words = len(offsets) - 1
+    scores = np.empty(num_words)
+    for start in range(0, num_words, block_size):
+        _score_block(
+            positions,
+            offsets,
+            start,
+            min(start + block_size, num_words),
+            scores,
+            prime,
+            tables,
+            fixed_indices,
+            valid_indices,
+        )
+    return scores
+
+
+@njit(cache=True)
+def _score_block(
+    positions,
+    offsets,
+    start,
+    end,
+    scores,
+    prime,
+    tables,
+    fixed_indices,
+    valid_indices,
+):
+    dimension, plane_lookup, line_lookup, plane_type, line_type = tables
+    total_points = prime**dimension
+    total_directions = (total_points - 1) // (prime - 1)
+    total_line_intercepts = total_points // prime
+    block_words = end - start
+
+    # size section, only words that pass it go on to the lookups
+    active = np.zeros(block_words, dtype=np.bool_)
+    line_thresholds = np.zeros(block_words, dtype=np.int64)
+    for word in range(block_words):
+        size = len(fixed_indices) + (
+            offsets[start + word + 1] - offsets[start + word]
+        )
+        score, size_pass, multiple = _size_scoring_from_size(size, prime)
+        scores[start + word] = score
+        active[word] = size_pass
+        line_thresholds[word] = min(multiple, prime - multiple)
+
+    # invert the block, for each point the words that contain it
+    point_offsets, point_words = _words_per_point(
+        positions, offsets, start, active, fixed_indices, valid_indices
+    )
+    if len(point_words) == 0:
+        return
+
+    # planes, one pass over the lookup rows for the whole block
+    plane_incidence = np.zeros(
+        (block_words, total_directions, prime), dtype=plane_type.dtype
+    )
+    # without lookups a point's intercepts are computed once per block
+    row = np.empty(total_directions, dtype=np.int64)
+    for point_index in range(total_points):
+        first = point_offsets[point_index]
+        last = point_offsets[point_index + 1]
+        if first == last:
+            continue
+        _scatter_plane_row(
+            prime,
+            dimension,
+            plane_lookup,
+            point_index,
+            row,
+            plane_incidence,
+            point_words,
+            first,
+            last,
+            active,
+        )
+    any_passed = False
+    for word in range(block_words):
+        if not active[word]:
+            continue
+        plane_score, plane_passed = _score_planes(
+            prime, plane_incidence[word], total_line_intercepts
+        )
+        scores[start + word] += plane_score
+        active[word] = plane_passed
+        any_passed = any_passed or plane_passed
+    if not any_passed:
+        return
+
+    # lines, only for the words whose planes all passed
+    line_incidence = np.zeros(
+        (block_words, total_directions, total_line_intercepts),
+        dtype=line_type.dtype,
+    )
+    for point_index in range(total_points):
+        first = point_offsets[point_index]
+        last = point_offsets[point_index + 1]
+        while first < last and not active[point_words[first]]:
+            first += 1
+        if first == last:
+            continue
+        _scatter_line_row(
+            prime,
+            dimension,
+            line_lookup,
+            point_index,
+            row,
+            line_incidence,
+            point_words,
+            first,
+            last,
+            active,
+        )
+    for word in range(block_words):
+        if not active[word]:
+            continue
+        line_score, line_passed = _score_lines(
+            prime, line_incidence[word], line_thresholds[word]
+        )
+        scores[start + word] += line_score
+        if line_passed:
+            scores[start + word] += _score_equidistribution(
+                prime, plane_incidence[word]
+            )
+
+
+@njit(cache=True)
+def _words_per_point(
+    positions, offsets, start, active, fixed_indices, valid_indices
+):
+    total_points = len(fixed_indices) + len(valid_indices)
+    point_offsets = np.zeros(total_points + 1, dtype=np.int64)
+    for word in range(len(active)):
+        if not active[word]:
+            continue
+        for point_index in fixed_indices:
+            point_offsets[point_index + 1] += 1
+        for entry in range(offsets[start + word], offsets[start + word + 1]):
+            point_offsets[valid_indices[positions[entry]] + 1] += 1
+    for point_index in range(total_points):
+        point_offsets[point_index + 1] += point_offsets[point_index]
+
+    point_words = np.empty(point_offsets[-1], dtype=np.int64)
+    filled = point_offsets[:-1].copy()
+    for word in range(len(active)):
+        if not active[word]:
+            continue
+        for point_index in fixed_indices:
+            point_words[filled[point_index]] = word
+            filled[point_index] += 1
+        for entry in range(offsets[start + word], offsets[start + word + 1]):
+            point_index = valid_indices[positions[entry]]
+            point_words[filled[point_index]] = word
+            filled[point_index] += 1
+    return point_offsets, point_words
+
+
+@njit(cache=True)
+def _size_scores(sizes, prime):
+    scores = np.empty(len(sizes))
+    passed = np.zeros(len(sizes), dtype=np.bool_)
+    for word in range(len(sizes)):
+        score, size_pass, _ = _size_scoring_from_size(sizes[word], prime)
+        scores[word] = score
+        passed[word] = size_pass
+    return scores, passed
+
+
+@njit(cache=True)
+def _size_scoring_from_size(size, prime):
     pass_size_section = False
-    size = 4 + np.sum(word)
     size_mod_p = size % prime
     score = _multiple_scoring(size_mod_p, prime)
     if score < prime:
@@ -112,7 +750,7 @@ def _size_scoring(word, prime):
     return score, pass_size_section, line_threshold
 
 
-@njit()
+@njit(cache=True)
 def _multiple_scoring(size_mod_p, prime):
     if size_mod_p != 0:
         symmetric_postion = min(size_mod_p, prime - size_mod_p)
@@ -121,7 +759,7 @@ def _multiple_scoring(size_mod_p, prime):
     return prime
 
 
-@njit()
+@njit(cache=True)
 def _relative_scoring(size, prime):
     multiple = size // prime
     prime_squared = prime**2
@@ -130,111 +768,230 @@ def _relative_scoring(size, prime):
     return prime_squared, multiple
 
 
-@njit()
-def _get_line_incidence_structures():
+@njit(cache=True)
+def _get_line_incidence_structures(
+    total_directions, total_line_intercepts, line_type
+):
     line_incidence = np.zeros(
-        (TOTAL_DIRECTIONS, TOTAL_LINE_INTERCEPTS), dtype=np.uint8
+        (total_directions, total_line_intercepts), dtype=line_type.dtype
     )
-    directions_determined = np.zeros(TOTAL_DIRECTIONS, dtype=np.uint8)
+    directions_determined = np.zeros(total_directions, dtype=np.uint8)
     return line_incidence, directions_determined
 
 
-@njit()
-def _get_plane_incidence_strutures():
+@njit(cache=True)
+def _get_plane_incidence_strutures(
+    total_directions, total_plane_intercepts, plane_type
+):
     plane_incidence = np.zeros(
-        (TOTAL_DIRECTIONS, TOTAL_PLANE_INTERCEPTS), dtype=np.uint8
+        (total_directions, total_plane_intercepts), dtype=plane_type.dtype
     )
-    plane_equidistribution = np.ones(TOTAL_DIRECTIONS, dtype=np.uint8)
+    plane_equidistribution = np.ones(total_directions, dtype=np.uint8)
     return plane_incidence, plane_equidistribution
 
 
-@njit()
-def _true_word_from_word(word):
-    true_word = np.zeros(TOTAL_POINTS, dtype=np.uint8)
-    true_word[0] = 1
-    true_word[1] = 1
-    true_word[PRIME] = 1
-    true_word[PRIME**2] = 1
-    for point_index in range(WORD_LENGTH):
-        true_word[VALID_INDICES[point_index]] = word[point_index]
+@njit(cache=True)
+def _true_word_from_word(word, total_points, fixed_indices, valid_indices):
+    true_word = np.zeros(total_points, dtype=np.uint8)
+    for fixed_index in fixed_indices:
+        true_word[fixed_index] = 1
+    for point_index in range(len(valid_indices)):
+        true_word[valid_indices[point_index]] = word[point_index]
     return true_word
 
 
-@njit()
+@njit(cache=True)
 def _update_plane_structures(
+    prime,
+    dimension,
+    plane_lookup,
     point_index,
     direction_index,
     plane_incidence,
     plane_equidistribution,
     multiple,
 ):
-    plane_intercept = PLANE_LOOKUP[point_index, direction_index]
+    plane_intercept = _plane_intercept(
+        prime, dimension, plane_lookup, point_index, direction_index
+    )
     plane_incidence[direction_index][plane_intercept] += 1
     if plane_incidence[direction_index][plane_intercept] > multiple:
         plane_equidistribution[direction_index] = 0
 
 
-@njit()
+@njit(cache=True)
 def _update_line_structures(
+    prime,
+    dimension,
+    line_lookup,
     point_index,
     direction_index,
     line_incidence,
     directions_determined,
 ):
-    line_intercept = LINE_LOOKUP[point_index][direction_index]
+    line_intercept = _line_intercept(
+        prime, dimension, line_lookup, point_index, direction_index
+    )
     line_incidence[direction_index][line_intercept] += 1
     if line_incidence[direction_index][line_intercept] > 1:
         directions_determined[direction_index] = 1
 
 
-@njit()
-def _score_incidence(
-    plane_incidence,
-    line_incidence,
-    line_threshold,
+@njit(cache=True)
+def _plane_intercept(
+    prime, dimension, plane_lookup, point_index, direction_index
 ):
+    """Reads the plane lookup, or computes the entry without one"""
+    if plane_lookup is None:
+        return lwu.get_plane_intercept_by_index(
+            prime, dimension, point_index, direction_index
+        )
+    return plane_lookup[point_index, direction_index]
+
+
+@njit(cache=True)
+def _line_intercept(
+    prime, dimension, line_lookup, point_index, direction_index
+):
+    """Reads the line lookup, or computes the entry without one"""
+    if line_lookup is None:
+        return lwu.get_line_intercept_by_index(
+            prime, dimension, point_index, direction_index
+        )
+    return line_lookup[point_index, direction_index]
+
+
+@njit(cache=True)
+def _scatter_plane_row(
+    prime,
+    dimension,
+    plane_lookup,
+    point_index,
+    row,
+    block_incidence,
+    point_words,
+    first,
+    last,
+    active,
+):
+    if plane_lookup is None:
+        for direction_index in range(len(row)):
+            row[direction_index] = lwu.get_plane_intercept_by_index(
+                prime, dimension, point_index, direction_index
+            )
+        _scatter_row(row, block_incidence, point_words, first, last, active)
+    else:
+        _scatter_row(
+            plane_lookup[point_index],
+            block_incidence,
+            point_words,
+            first,
+            last,
+            active,
+        )
+
+
+@njit(cache=True)
+def _scatter_line_row(
+    prime,
+    dimension,
+    line_lookup,
+    point_index,
+    row,
+    block_incidence,
+    point_words,
+    first,
+    last,
+    active,
+):
+    if line_lookup is None:
+        for direction_index in range(len(row)):
+            row[direction_index] = lwu.get_line_intercept_by_index(
+                prime, dimension, point_index, direction_index
+            )
+        _scatter_row(row, block_incidence, point_words, first, last, active)
+    else:
+        _scatter_row(
+            line_lookup[point_index],
+            block_incidence,
+            point_words,
+            first,
+            last,
+            active,
+        )
+
+
+@njit(cache=True)
+def _scatter_row(row, block_incidence, point_words, first, last, active):
+    """Adds one point's intercepts to the incidence of the active words
+    point_words[first:last] that contain it"""
+    for entry in range(first, last):
+        word = point_words[entry]
+        if not active[word]:
+            continue
+        incidence = block_incidence[word]
+        for direction_index in range(len(row)):
+            incidence[direction_index, row[direction_index]] += 1
+
+
+@njit(cache=True)
+def _score_planes(prime, plane_incidence, total_line_intercepts):
+    total_directions, total_plane_intercepts = plane_incidence.shape
     plane_score = 0
-    line_score = 0
-    equidistribution_score = 0
     plane_passed = True
-    line_passed = True
-    for direction in range(TOTAL_DIRECTIONS):
-        # planes
-        max_plane = 0
-        min_plane = TOTAL_LINE_INTERCEPTS
-        for intercept in range(TOTAL_PLANE_INTERCEPTS):
+    for direction in range(total_directions):
+        for intercept in range(total_plane_intercepts):
             incidence = plane_incidence[direction][intercept]
-            # track max and min for equiditribuion
-            max_plane = max(incidence, max_plane)
-            min_plane = min(incidence, min_plane)
             # add appropriate scores depending on if there's
             # a plane with more that PRIME points
-            if incidence <= PRIME:
-                plane_score += TOTAL_LINE_INTERCEPTS
+            if incidence <= prime:
+                plane_score += total_line_intercepts
             else:
                 plane_passed = False
-                plane_score += TOTAL_LINE_INTERCEPTS - incidence
-
-        # Add equidistribution score, a single totally
-        # equidistributed direction should be more valuable
-        # than all of them being very close to zero, but nonzero
-        local_equidistribution = PRIME - (max_plane - min_plane)
-        if local_equidistribution == PRIME:
-            equidistribution_score += PRIME * TOTAL_DIRECTIONS
-        else:
-            equidistribution_score += local_equidistribution
-        # lines
-        for intercept in range(TOTAL_LINE_INTERCEPTS):
+                plane_score += total_line_intercepts - incidence
+    return plane_score, plane_passed
+
+
+@njit(cache=True)
+def _score_lines(prime, line_incidence, line_threshold):
+    total_directions, total_line_intercepts = line_incidence.shape
+    line_score = 0
+    line_passed = True
+    for direction in range(total_directions):
+        for intercept in range(total_line_intercepts):
             incidence = line_incidence[direction][intercept]
             if incidence <= line_threshold:
-                line_score += TOTAL_PLANE_INTERCEPTS
+                line_score += prime
             else:
                 line_passed = False
-                line_score += TOTAL_PLANE_INTERCEPTS - incidence
-    score = plane_score
-    if not plane_passed:
-        return score
-    score += line_score
-    if not line_passed:
-        return score
-    return score + equidistribution_score
+                line_score += prime - incidence
+    return line_score, line_passed
+
+
+@njit(cache=True)
+def _score_equidistribution(prime, plane_incidence):
+    total_directions, total_plane_intercepts = plane_incidence.shape
+    equidistribution_score = 0
+    for direction in range(total_directions):
+        # track max and min for equiditribuion
+        max_plane = plane_incidence[direction][0]
+        min_plane = plane_incidence[direction][0]
+        for intercept in range(1, total_plane_intercepts):
+            incidence = plane_incidence[direction][intercept]
+            max_plane = max(incidence, max_plane)
+            min_plane = min(incidence, min_plane)
+        equidistribution_score += _equidistribution_contribution(
+            max_plane - min_plane, prime, total_directions
+        )
+    return equidistribution_score
+
+
+@njit(cache=True)
+def _equidistribution_contribution(spread, prime, total_directions):
+    # Add equidistribution score, a single totally
+    # equidistributed direction should be more valuable
+    # than all of them being very close to zero, but nonzero
+    local_equidistribution = prime - spread
+    if local_equidistribution == prime:
+        return prime * total_directions
+    return local_equidistribution
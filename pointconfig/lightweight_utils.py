@@ -1,8 +1,8 @@
 import numpy as np
-from numba import njit 
+from numba import njit
 
 
-@njit
+@njit(cache=True)
 def get_direction_subdimension(prime, dimension, direction_index):
     sub_dimension = 0
     threshold = ((prime**sub_dimension) - 1) // (prime - 1)
@@ -12,7 +12,7 @@ def get_direction_subdimension(prime, dimension, direction_index):
     return sub_dimension - 1
 
 
-@njit
+@njit(cache=True)
 def get_plane_intercept_by_index(
     prime, dimension, point_index, normal_direction_index
 ):
@@ -40,7 +40,7 @@ def get_plane_intercept_by_index(
     return dot_product % prime
 
 
-@njit
+@njit(cache=True)
 def compute_key_coordinate(prime, dimension, sub_dimension, point_index):
     key_expand = point_index
     for _ in range(dimension - 1, sub_dimension, -1):
@@ -48,7 +48,7 @@ def compute_key_coordinate(prime, dimension, sub_dimension, point_index):
     return key_expand % prime
 
 
-@njit
+@njit(cache=True)
 def get_line_intercept_by_index(
     prime, dimension, point_index, direction_index
 ):
@@ -80,43 +80,74 @@ def get_line_intercept_by_index(
     return intercept_index
 
 
+def smallest_uint(max_value):
+    """
+    Smallest unsigned numpy integer type that holds max_value.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def make_plane_lookup(prime, dimension):
+    total_points = prime**dimension
+    total_directions = ((prime**dimension) - 1) // (prime - 1)
+    lookup = np.empty(
+        (total_points, total_directions), dtype=smallest_uint(prime - 1)
+    )
+    _fill_plane_lookup(prime, dimension, lookup)
+    return lookup
+
+
+def make_line_lookup(prime, dimension):
+    total_points = prime**dimension
+    total_directions = ((prime**dimension) - 1) // (prime - 1)
+    lookup = np.empty(
+        (total_points, total_directions),
+        dtype=smallest_uint(prime ** (dimension - 1) - 1),
+    )
+    _fill_line_lookup(prime, dimension, lookup)
+    return lookup
+
+
+@njit(cache=True)
+def _fill_plane_lookup(prime, dimension, lookup):
+    total_points, total_directions = lookup.shape
+    for point_index in range(total_points):
+        for normal_direction_index in range(total_directions):
+            lookup[point_index][normal_direction_index] = (
+                get_plane_intercept_by_index(
+                    prime, dimension, point_index, normal_direction_index
+                )
+            )
+
+
+@njit(cache=True)
+def _fill_line_lookup(prime, dimension, lookup):
+    total_points, total_directions = lookup.shape
+    for point_index in range(total_points):
+        for direction_index in range(total_directions):
+            lookup[point_index][direction_index] = get_line_intercept_by_index(
+                prime, dimension, point_index, direction_index
+            )
+
+
 def plane_lookup_factory(prime, dimension):
-    @njit
     def plane_lookup():
-        total_points = prime**dimension
-        total_directions = ((prime**dimension) - 1) // (prime - 1)
-        lookup = np.empty((total_points, total_directions), dtype=np.uint8)
-        for point_index in range(total_points):
-            for normal_direction_index in range(total_directions):
-                lookup[point_index][normal_direction_index] = (
-                    get_plane_intercept_by_index(
-                        prime, dimension, point_index, normal_direction_index
-                    )
-                )
-        return lookup
+        return make_plane_lookup(prime, dimension)
 
     return plane_lookup
 
 
 def line_lookup_factory(prime, dimension):
-    @njit
     def line_lookup():
-        total_points = prime**dimension
-        total_directions = ((prime**dimension) - 1) // (prime - 1)
-        lookup = np.empty((total_points, total_directions), dtype=np.uint16)
-        for point_index in range(total_points):
-            for direction_index in range(total_directions):
-                lookup[point_index][direction_index] = (
-                    get_line_intercept_by_index(
-                        prime, dimension, point_index, direction_index
-                    )
-                )
-        return lookup
+        return make_line_lookup(prime, dimension)
 
     return line_lookup
 
 
-@njit
+@njit(cache=True)
 def get_plane_intercept(prime, dimension, point, normal_direction):
     dot_product = 0
     for coord in range(dimension):
@@ -124,7 +155,7 @@ def get_plane_intercept(prime, dimension, point, normal_direction):
     return dot_product % prime
 
 
-@njit
+@njit(cache=True)
 def get_line_intercept(prime, dimension, point, direction):
     non_zero_index = dimension - 1
     for i in range(dimension - 1, -1, -1):
@@ -150,7 +181,7 @@ def get_line_intercept(prime, dimension, point, direction):
     return intercept
 
 
-@njit
+@njit(cache=True)
 def point_to_index(prime, dimension, point):
     index = 0
     for i in range(dimension - 1, -1, -1):
@@ -158,7 +189,7 @@ def point_to_index(prime, dimension, point):
     return index
 
 
-@njit
+@njit(cache=True)
 def index_to_point(prime, dimension, index):
     point = np.zeros(dimension, dtype=np.uint8)
     to_expand = index
@@ -168,17 +199,17 @@ def index_to_point(prime, dimension, index):
     return point
 
 
-@njit
+@njit(cache=True)
 def intercept_to_index(prime, dimension, intercept):
     return point_to_index(prime, dimension - 1, intercept)
 
 
-@njit
+@njit(cache=True)
 def index_to_intercept(prime, dimension, intercept):
     return index_to_point(prime, dimension - 1, intercept)
 
 
-@njit
+@njit(cache=True)
 def direction_to_index(prime, dimension, direction):
     non_zero_index = dimension - 1
     for i in range(dimension - 1, -1, -1):
@@ -193,7 +224,7 @@ def direction_to_index(prime, dimension, direction):
     return shift + point_index
 
 
-@njit
+@njit(cache=True)
 def index_to_direction(prime, dimension, index):
     direction = np.zeros(dimension, dtype=np.uint8)
 
@@ -0,0 +1,70 @@
+"""
+On-disk cache for the plane and line lookup tables.
+Tables are stored as .npy files keyed by (prime, dimension) under a
+versioned directory and loaded back as read-only memory maps.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Bump whenever the layout or dtype of a cached table changes
+LOOKUP_CACHE_VERSION = 2
+CACHE_DIR_ENV = "POINTCONFIG_CACHE_DIR"
+
+
+def cache_dir():
+    """
+    Root of the cache, $POINTCONFIG_CACHE_DIR or ~/.cache/pointconfig.
+    """
+    root = os.environ.get(CACHE_DIR_ENV)
+    if root is None:
+        root = Path.home() / ".cache" / "pointconfig"
+    return Path(root) / f"v{LOOKUP_CACHE_VERSION}"
+
+
+def lookup_path(name, prime, dimension):
+    return cache_dir() / f"{name}_lookup_p{prime}_d{dimension}.npy"
+
+
+def load_lookup(name, prime, dimension, builder):
+    """
+    Returns the named lookup for (prime, dimension) as a read-only array,
+    memory mapped from the cache when possible. On a miss (or an
+    unreadable file) the table is built with builder(prime, dimension)
+    and written back; an unwritable cache just skips the write.
+    """
+    path = lookup_path(name, prime, dimension)
+    try:
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        pass
+
+    lookup = builder(prime, dimension)
+    try:
+        save_atomically(path, lambda f: np.save(f, lookup))
+    except OSError:
+        pass
+    # match the memory mapped tables so the kernels see one array type
+    lookup.flags.writeable = False
+    return lookup
+
+
+def save_atomically(path, write):
+    """
+    Calls write(f) on a temporary file next to path and moves it into
+    place, so readers see either no file or a complete one.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, tmp_name = tempfile.mkstemp(
+        dir=path.parent, suffix=".tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            write(f)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
@@ -1,53 +1,177 @@
+import math
+
 import torch
 import numpy as np
 
 import pointconfig.lightweight_score as lws
 import pointconfig.model as pcm
+from pointconfig.compiled_sampler import CompiledSampler
+from pointconfig.expand_subset import expand_subsets
+from pointconfig.lightweight_delta import IncrementalScorer
 
 INPUT_LENGTH = 2 * lws.WORD_LENGTH
 
 
-def generate_subset(model):
-    all_stages = np.zeros((lws.WORD_LENGTH, INPUT_LENGTH + 1), dtype=np.uint8)
-    for stage in range(lws.WORD_LENGTH):
-        input_sequence = np.zeros(INPUT_LENGTH, dtype=np.uint8)
-        for point_index in range(stage):
-            input_sequence[point_index] = all_stages[stage - 1, point_index]
-        input_sequence[stage + lws.WORD_LENGTH] = 1
-        all_stages[stage, stage + lws.WORD_LENGTH] = 1
-
-        prob = pcm.model_forward(input_sequence, model)
-        include_point = np.uint8(np.random.rand() < prob)
-        all_stages[stage, INPUT_LENGTH] = include_point
-        for next_stage in range(stage + 1, lws.WORD_LENGTH):
-            all_stages[next_stage, stage] = include_point
-
-        subset = np.zeros(lws.WORD_LENGTH, dtype=np.uint8)
-        for index in range(lws.WORD_LENGTH - 1):
-            subset[index] = all_stages[-1, index]
-        subset[-1] = all_stages[-1][-1]
-        score = lws.score_word(subset)
-    return all_stages, score
-
-
-def generate_subsets(model, num_subsets):
-    all_subsets = torch.zeros((num_subsets, INPUT_LENGTH), dtype=torch.float32)
-
-    for stage in range(lws.WORD_LENGTH):
-        all_subsets[:, stage + lws.WORD_LENGTH] = 1.0
-        probs = pcm.model_forward(all_subsets, model)
-        all_subsets[:, stage] = (torch.rand(num_subsets) < probs).to(
-            torch.float32
-        )
-        all_subsets[:, stage + lws.WORD_LENGTH] = 0.0
+def generate_subset(model, context=None):
+    """
+    Samples one word from model and scores it once at the end. Returns
+    the training rows of the word (see expand_subset.expand_subsets) as
+    an array, the last column being the bit sampled at each stage, and
+    the score. Draws the same word as sample_subsets(model, 1) from the
+    same RNG state.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    word_length = context.word_length
+    stage_encoding = pcm.stage_encoding_of(model)
+    subset = torch.zeros((1, pcm.subset_width(word_length, stage_encoding)))
+    for stage, included in _sample_stages(model, word_length):
+        subset[0, stage] = included
+    word = subset[0, :word_length].numpy().astype(np.uint8)
+    all_stages = expand_subsets(subset, word_length, stage_encoding)
+    return all_stages.numpy(), context.score_word(word)
+
+
+def generate_subset_stages(model, context=None):
+    """
+    Samples one word like generate_subset, yielding (stage, bit, score)
+    after every stage. score is that of the word sampled so far, kept by
+    an IncrementalScorer, so the last score is the word's score.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    scorer = IncrementalScorer(context)
+    for stage, included in _sample_stages(model, context.word_length):
+        if included:
+            scorer.add_point(context.valid_indices[stage])
+        yield stage, included, scorer.score()
+
+
+def _sample_stages(model, word_length):
+    # sample_subsets for a single row, one stage at a time
+    with torch.no_grad():
+        bit_columns, stage_rows, bias, rest = pcm.first_layer_parts(model)
+        pre_activations = bias.unsqueeze(0).clone()
+        for stage in range(word_length):
+            prob = rest(pre_activations + stage_rows[stage]).item()
+            included = bool(torch.rand(1).item() < prob)
+            if included:
+                pre_activations += bit_columns[stage]
+            yield stage, included
+
+
+def sample_subsets(model, num_subsets, context=None):
+    """
+    Samples num_subsets words from model stage by stage. The input only
+    changes in two coordinates between stages (the bit just sampled and
+    the stage), so the first layer pre-activations are kept and updated
+    with one weight column per stage instead of rerunning the full first
+    layer matmul. model is either build_model's nn.Sequential or a
+    StageEmbeddingModel; rows are as wide as the model's input without
+    the stage (see model.subset_width). A CompiledSampler runs the same
+    loop in one scripted call, and a FactorizedModel draws every stage
+    at once.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    word_length = context.word_length
+    if isinstance(model, CompiledSampler):
+        return model.sample(num_subsets, word_length)
+    if isinstance(model, pcm.FactorizedModel):
+        # no dependence between positions, one draw for every stage
+        with torch.no_grad():
+            probs = torch.sigmoid(model.logits)
+            return (torch.rand(num_subsets, word_length) < probs).to(
+                torch.float32
+            )
+    all_subsets = torch.zeros(
+        (
+            num_subsets,
+            pcm.subset_width(word_length, pcm.stage_encoding_of(model)),
+        ),
+        dtype=torch.float32,
+    )
+
+    with torch.no_grad():
+        bit_columns, stage_rows, bias, rest = pcm.first_layer_parts(model)
+        bit_columns = bit_columns.contiguous()
+        pre_activations = bias.repeat(num_subsets, 1)
+        for stage in range(word_length):
+            probs = rest(pre_activations + stage_rows[stage])
+            included = (torch.rand(num_subsets) < probs.flatten()).to(
+                torch.float32
+            )
+            all_subsets[:, stage] = included
+            pre_activations.addr_(included, bit_columns[stage])
 
-    scores = lws.score_words(all_subsets.numpy().astype(np.uint8))
+    return all_subsets
+
+
+def generate_subsets(model, num_subsets, num_threads=None, context=None):
+    """
+    Samples num_subsets words with sample_subsets and scores them.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    all_subsets = sample_subsets(model, num_subsets, context)
+    scores = context.score_words_blocked(
+        all_subsets[:, : context.word_length].numpy().astype(np.uint8),
+        num_threads=num_threads,
+    )
 
     return all_subsets, scores
 
 
+def generate_top_subsets(
+    model,
+    num_subsets,
+    num_elites,
+    chunk_size=lws.BATCH_SIZE,
+    num_threads=None,
+    context=None,
+):
+    """
+    generate_subsets followed by top_subsets, but sampled and scored
+    chunk_size words at a time with each chunk folded into the running
+    best, so memory is bounded by chunk_size + num_elites rows however
+    many subsets are drawn.
+    """
+    best_subsets, best_scores = None, None
+    for start in range(0, num_subsets, chunk_size):
+        subsets, scores = generate_subsets(
+            model, min(chunk_size, num_subsets - start), num_threads, context
+        )
+        if best_subsets is not None:
+            subsets = torch.cat([best_subsets, subsets])
+            scores = np.concatenate([best_scores, scores])
+        best_subsets, best_scores = top_subsets(subsets, scores, num_elites)
+    if best_subsets is None:
+        return generate_subsets(model, 0, num_threads, context)
+    return best_subsets, best_scores
+
+
+def elite_count(num_subsets, percentile):
+    """
+    How many subsets are above the percentile of num_subsets, rounded
+    half up so that e.g. the 90th percentile of 1000 keeps 100 rather
+    than 99, and at least one of a non-empty batch.
+    """
+    count = math.floor(num_subsets * (100 - percentile) / 100 + 0.5)
+    return min(num_subsets, max(1, count))
+
+
+def top_subsets(subsets, scores, num_elites):
+    """
+    The num_elites highest scoring subsets (in no particular order),
+    subsets may be a tensor or an array.
+    """
+    if len(scores) <= num_elites:
+        return subsets, scores
+    if num_elites == 0:
+        return subsets[:0], scores[:0]
+    indices = np.argpartition(scores, -num_elites)[-num_elites:]
+    return subsets[indices, :], scores[indices]
+
+
 def get_highest_subsets(subsets, scores, percentile):
-    assert len(scores) == lws.BATCH_SIZE
-    k_highest = int(lws.BATCH_SIZE * (1 - (percentile / 100)))
-    indices = np.argpartition(scores, -k_highest)[-k_highest:]
-    return subsets[torch.tensor(indices), :], scores[indices]
+    return top_subsets(subsets, scores, elite_count(len(scores), percentile))
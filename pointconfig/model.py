@@ -1,14 +1,16 @@
+import copy
+import warnings
+
 import torch
 from torch import nn
 import numpy as np
 
 import pointconfig.lightweight_score as lws
-import pointconfig.make_subset as ms
 
 PRIME = lws.PRIME
 DIMENSION = lws.DIMENSION
 WORD_LENGTH = lws.WORD_LENGTH
-INPUT_LENGTH = ms.INPUT_LENGTH
+INPUT_LENGTH = 2 * WORD_LENGTH
 
 FIRST_LAYER = 128
 SECOND_LAYER = 64
@@ -16,10 +18,25 @@ THIRD_LAYER = 4
 
 LEARNING_RATE = 1e-3
 
+# how the model is told which stage it is predicting
+ONE_HOT = "one_hot"
+EMBEDDING = "embedding"
+STAGE_ENCODINGS = (ONE_HOT, EMBEDDING)
+
+# an MLP predicting each bit from the ones before, or independent bits
+AUTOREGRESSIVE = "autoregressive"
+FACTORIZED = "factorized"
+MODEL_KINDS = (AUTOREGRESSIVE, FACTORIZED)
+
+# precision of the network behind the first layer while sampling
+FLOAT32 = "float32"
+BFLOAT16 = "bfloat16"
+INT8 = "int8"
+INFERENCE_PRECISIONS = (FLOAT32, BFLOAT16, INT8)
+
 
-def model_info():
-    model = nn.Sequential(
-        nn.Linear(INPUT_LENGTH, FIRST_LAYER),
+def _after_first_layer():
+    return [
         nn.ReLU(),
         nn.Linear(FIRST_LAYER, SECOND_LAYER),
         nn.ReLU(),
@@ -27,31 +44,255 @@ def model_info():
         nn.ReLU(),
         nn.Linear(THIRD_LAYER, 1),
         nn.Sigmoid(),
+    ]
+
+
+def build_model(input_length=INPUT_LENGTH):
+    return nn.Sequential(
+        nn.Linear(input_length, FIRST_LAYER), *_after_first_layer()
+    )
+
+
+class StageEmbeddingModel(nn.Module):
+    """
+    build_model with the stage one-hot replaced by a learned bias per
+    stage on the first layer, which is the same function without the
+    identity block in the input. Inputs are the word_length prefix bits
+    followed by the stage index.
+    """
+
+    stage_encoding = EMBEDDING
+
+    def __init__(self, word_length=WORD_LENGTH):
+        super().__init__()
+        self.word_length = word_length
+        self.first_layer = nn.Linear(word_length, FIRST_LAYER)
+        self.stage_embedding = nn.Embedding(word_length, FIRST_LAYER)
+        # start like the one-hot columns of nn.Linear(2 * word_length)
+        bound = (2 * word_length) ** -0.5
+        nn.init.uniform_(self.stage_embedding.weight, -bound, bound)
+        self.rest = nn.Sequential(*_after_first_layer())
+
+    def forward(self, data_input):
+        bits = data_input[:, : self.word_length]
+        stages = data_input[:, self.word_length].long()
+        return self.rest(self.first_layer(bits) + self.stage_embedding(stages))
+
+
+class FactorizedModel(nn.Module):
+    """
+    One learned logit per position and no dependence between positions,
+    so whole words are drawn in one vectorized step. Takes the same
+    training rows as StageEmbeddingModel and ignores the prefix bits.
+    """
+
+    stage_encoding = EMBEDDING
+    model_kind = FACTORIZED
+
+    def __init__(self, word_length=WORD_LENGTH):
+        super().__init__()
+        self.word_length = word_length
+        self.logits = nn.Parameter(torch.zeros(word_length))
+
+    def forward(self, data_input):
+        stages = data_input[:, self.word_length].long()
+        return torch.sigmoid(self.logits[stages]).unsqueeze(1)
+
+
+def make_model(
+    word_length=WORD_LENGTH, stage_encoding=ONE_HOT, model_kind=AUTOREGRESSIVE
+):
+    """
+    stage_encoding only applies to the autoregressive model, the
+    factorized one always takes embedding rows.
+    """
+    if model_kind == FACTORIZED:
+        return FactorizedModel(word_length)
+    if model_kind != AUTOREGRESSIVE:
+        raise ValueError(f"Unknown model kind {model_kind!r}")
+    if stage_encoding == ONE_HOT:
+        return build_model(2 * word_length)
+    if stage_encoding == EMBEDDING:
+        return StageEmbeddingModel(word_length)
+    raise ValueError(f"Unknown stage encoding {stage_encoding!r}")
+
+
+def stage_encoding_of(model):
+    return getattr(model, "stage_encoding", ONE_HOT)
+
+
+def model_kind_of(model):
+    return getattr(model, "model_kind", AUTOREGRESSIVE)
+
+
+def subset_width(word_length, stage_encoding=ONE_HOT):
+    """
+    Width of a sampled subset row, the model input without the stage.
+    """
+    if stage_encoding == EMBEDDING:
+        return word_length
+    return 2 * word_length
+
+
+def first_layer_parts(model):
+    """
+    Returns (bit_columns, stage_rows, bias, rest). The first layer
+    pre-activation at stage s is bias + stage_rows[s] plus the rows of
+    bit_columns for the bits set so far, and rest maps it to the output.
+    """
+    if isinstance(model, InferenceModel):
+        return model.parts
+    if isinstance(model, FactorizedModel):
+        # no first layer, the logit is the stage row
+        logits = model.logits.unsqueeze(1)
+        return (
+            torch.zeros_like(logits),
+            logits,
+            torch.zeros(1),
+            nn.Sequential(nn.Sigmoid()),
+        )
+    if stage_encoding_of(model) == EMBEDDING:
+        return (
+            model.first_layer.weight.T,
+            model.stage_embedding.weight,
+            model.first_layer.bias,
+            model.rest,
+        )
+    first_layer = model[0]
+    word_length = first_layer.in_features // 2
+    columns = first_layer.weight.T
+    return (
+        columns[:word_length],
+        columns[word_length:],
+        first_layer.bias,
+        model[1:],
     )
 
+
+class InferenceModel:
+    """
+    Sampling copy of a model with everything after the first layer in
+    reduced precision: bfloat16, or int8 weights with dynamically
+    quantized activations. The first layer stays float32, the sampler
+    only adds its columns and bfloat16 would lose the running sum.
+    Call refresh after the training weights change (once per loop).
+    Works anywhere the model does for sampling, including model_forward.
+    """
+
+    def __init__(self, model, precision=BFLOAT16):
+        if precision not in INFERENCE_PRECISIONS:
+            raise ValueError(f"Unknown inference precision {precision!r}")
+        self.model = model
+        self.precision = precision
+        self.stage_encoding = stage_encoding_of(model)
+        self.refresh()
+
+    def refresh(self):
+        with torch.no_grad():
+            bit_columns, stage_rows, bias, rest = first_layer_parts(self.model)
+            rest = copy.deepcopy(rest).eval()
+            if self.precision == BFLOAT16:
+                rest = _InPrecision(rest.to(torch.bfloat16), torch.bfloat16)
+            elif self.precision == INT8:
+                with warnings.catch_warnings():
+                    # eager mode quantization warns that it is deprecated
+                    warnings.simplefilter("ignore")
+                    rest = torch.ao.quantization.quantize_dynamic(
+                        rest, {nn.Linear}, dtype=torch.qint8
+                    )
+            self.parts = (
+                bit_columns.detach().clone(),
+                stage_rows.detach().clone(),
+                bias.detach().clone(),
+                rest,
+            )
+
+    def __call__(self, data_input):
+        bit_columns, stage_rows, bias, rest = self.parts
+        word_length = len(bit_columns)
+        pre_activations = data_input[:, :word_length] @ bit_columns + bias
+        if self.stage_encoding == EMBEDDING:
+            stages = data_input[:, word_length].long()
+            pre_activations += stage_rows[stages]
+        else:
+            pre_activations += data_input[:, word_length:] @ stage_rows
+        return rest(pre_activations)
+
+
+class _InPrecision(nn.Module):
+    def __init__(self, module, dtype):
+        super().__init__()
+        self.module = module
+        self.dtype = dtype
+
+    def forward(self, data_input):
+        return self.module(data_input.to(self.dtype)).float()
+
+
+def inference_model(model, precision=FLOAT32):
+    """
+    model itself for float32, otherwise an InferenceModel copy.
+    """
+    if precision == FLOAT32:
+        return model
+    return InferenceModel(model, precision)
+
+
+def model_info(
+    context=None, stage_encoding=ONE_HOT, model_kind=AUTOREGRESSIVE
+):
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    model = make_model(context.word_length, stage_encoding, model_kind)
     loss_function = nn.BCELoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
     complete_model_info = {
         "model": model,
         "loss_function": loss_function,
         "optimizer": optimizer,
+        "context": context,
+        "stage_encoding": stage_encoding_of(model),
+        "model_kind": model_kind,
     }
     return complete_model_info
 
 
 def train_model(
-    data, model, loss_function, optimizer, batch_size=1024, shuffle=True
+    data,
+    model,
+    loss_function,
+    optimizer,
+    batch_size=1024,
+    shuffle=True,
+    prefix_sums=False,
 ):
-    data_size = data.shape[0]
+    """
+    data is a tensor of training rows, or anything with a length and
+    rows(indices) building just those rows (see
+    expand_subset.ExpandedSubsets), which is then shuffled by index.
+    With prefix_sums, data is an ExpandedSubsets and every minibatch
+    is all the stages of batch_size // word_length shuffled words, see
+    _word_stages_loss.
+    """
+    if prefix_sums:
+        return _train_on_words(
+            data, model, loss_function, optimizer, batch_size, shuffle
+        )
+    data_size = len(data)
+    lazy = not isinstance(data, torch.Tensor)
     if shuffle:
         indices = torch.randperm(data_size)
-        data = data[indices, :]
+        if not lazy:
+            data = data[indices, :]
+    elif lazy:
+        indices = torch.arange(data_size)
     model.train()
     total_loss = 0
     for start in range(0, data_size, batch_size):
         end = start + batch_size
-        data_input = data[start:end, :-1].float()
-        data_true = data[start:end, -1].float().unsqueeze(1)
+        batch = data.rows(indices[start:end]) if lazy else data[start:end]
+        data_input = batch[:, :-1].float()
+        data_true = batch[:, -1].float().unsqueeze(1)
 
         data_pred = model(data_input)
         loss = loss_function(data_pred, data_true)
@@ -65,6 +306,49 @@ def train_model(
     return total_loss / data_size
 
 
+def _train_on_words(
+    data, model, loss_function, optimizer, batch_size, shuffle
+):
+    num_words = len(data) // data.word_length
+    words_per_batch = max(1, batch_size // data.word_length)
+    if shuffle:
+        indices = torch.randperm(num_words)
+    else:
+        indices = torch.arange(num_words)
+    model.train()
+    total_loss = 0
+    for start in range(0, num_words, words_per_batch):
+        words = data.words(indices[start : start + words_per_batch])
+        loss = _word_stages_loss(words, model, loss_function)
+
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+        total_loss += loss.item() * words.numel()
+
+    return total_loss / len(data)
+
+
+def _word_stages_loss(words, model, loss_function):
+    """
+    Loss over the training rows of every stage of words without building
+    them. The row for stage s of a word has the bits before s set, so
+    its first layer pre-activation is an exclusive cumulative sum of the
+    bit columns of the word plus the stage row; the rest of the model
+    then runs on all the stages in one batch.
+    """
+    bit_columns, stage_rows, bias, rest = first_layer_parts(model)
+    contributions = words[:, :-1].unsqueeze(2) * bit_columns[:-1]
+    prefix_sums = torch.cat(
+        [torch.zeros_like(contributions[:, :1]), contributions.cumsum(1)],
+        dim=1,
+    )
+    pre_activations = prefix_sums + stage_rows + bias
+    predictions = rest(pre_activations.reshape(-1, pre_activations.shape[2]))
+    return loss_function(predictions, words.reshape(-1, 1))
+
+
 def model_forward(data_input, model):
     with torch.no_grad():
         return model(data_input).flatten()
@@ -0,0 +1,165 @@
+"""
+Overlapped sampling and scoring. The calling thread samples chunks of
+subsets with torch while a pool of worker threads scores the chunks
+already sampled with the nogil numba kernels. At most depth chunks are
+sampled but not yet scored, which bounds the memory held in flight.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+import pointconfig.lightweight_score as lws
+from pointconfig.make_subset import elite_count, sample_subsets, top_subsets
+
+CHUNK_SIZE = 250
+DEPTH = 2
+WORKERS = 1
+
+
+class PipelineStats:
+    """
+    Time spent in each stage of one pipelined batch. Utilisation is the
+    busy time of a stage over the wall time, per worker for scoring.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.chunks = 0
+        self.wall_time = 0.0
+        self.sample_time = 0.0
+        # sampler blocked because depth chunks were waiting on scoring
+        self.sample_wait_time = 0.0
+        self.score_time = 0.0
+        self.select_time = 0.0
+
+    @property
+    def sample_utilisation(self):
+        if not self.wall_time:
+            return 0.0
+        return self.sample_time / self.wall_time
+
+    @property
+    def score_utilisation(self):
+        if not self.wall_time:
+            return 0.0
+        return self.score_time / (self.wall_time * self.workers)
+
+    def summary(self):
+        return (
+            f"{self.chunks} chunks in {self.wall_time:.2f}s, "
+            f"sampling {self.sample_utilisation:.0%} busy "
+            f"({self.sample_wait_time:.2f}s waiting), "
+            f"scoring {self.score_utilisation:.0%} busy "
+            f"over {self.workers} workers, "
+            f"selection {self.select_time:.2f}s"
+        )
+
+
+def sample_and_score(
+    model,
+    num_subsets,
+    chunk_size=CHUNK_SIZE,
+    depth=DEPTH,
+    workers=WORKERS,
+    context=None,
+):
+    """
+    Same as make_subset.generate_subsets, with chunk k scored on the
+    worker threads while chunk k + 1 is sampled. Returns the subsets,
+    their scores and the PipelineStats of the batch.
+    """
+    stats = PipelineStats(workers)
+    start_time = time.perf_counter()
+    scored = list(
+        _scored_chunks(
+            model, num_subsets, chunk_size, depth, workers, context, stats
+        )
+    )
+    stats.wall_time = time.perf_counter() - start_time
+    if not scored:
+        return sample_subsets(model, 0, context), np.empty(0), stats
+    all_subsets = torch.cat([subsets for subsets, _ in scored])
+    scores = np.concatenate([chunk_scores for _, chunk_scores in scored])
+    return all_subsets, scores, stats
+
+
+def best_from_pipeline(
+    model,
+    batch_size,
+    percentile=90,
+    chunk_size=CHUNK_SIZE,
+    depth=DEPTH,
+    workers=WORKERS,
+    context=None,
+):
+    """
+    train.best_from_model on the pipeline. Each scored chunk is folded
+    into the running best, so only depth chunks and the elites are held
+    at once. Returns the best subsets, their scores and the
+    PipelineStats including selection.
+    """
+    num_elites = elite_count(batch_size, percentile)
+    stats = PipelineStats(workers)
+    start_time = time.perf_counter()
+    best_subsets, best_scores = sample_subsets(model, 0, context), []
+    for subsets, scores in _scored_chunks(
+        model, batch_size, chunk_size, depth, workers, context, stats
+    ):
+        tick = time.perf_counter()
+        best_subsets, best_scores = top_subsets(
+            torch.cat([best_subsets, subsets]),
+            np.concatenate([best_scores, scores]),
+            num_elites,
+        )
+        stats.select_time += time.perf_counter() - tick
+    stats.wall_time = time.perf_counter() - start_time
+    return best_subsets, np.asarray(best_scores, dtype=np.float64), stats
+
+
+def _scored_chunks(
+    model, num_subsets, chunk_size, depth, workers, context, stats
+):
+    """
+    Yields (subsets, scores) chunk by chunk in sampling order.
+    """
+    if context is None:
+        context = lws.DEFAULT_CONTEXT
+    if depth < 1 or workers < 1:
+        raise ValueError("depth and workers must be at least 1")
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, num_subsets, chunk_size):
+            tick = time.perf_counter()
+            subsets = sample_subsets(
+                model, min(chunk_size, num_subsets - start), context
+            )
+            stats.sample_time += time.perf_counter() - tick
+            if len(pending) == depth:
+                tick = time.perf_counter()
+                scored = pending.popleft().result()
+                stats.sample_wait_time += time.perf_counter() - tick
+                yield _record(scored, stats)
+            pending.append(pool.submit(_score_chunk, subsets, context))
+        while pending:
+            yield _record(pending.popleft().result(), stats)
+
+
+def _record(scored, stats):
+    subsets, scores, score_time = scored
+    stats.chunks += 1
+    stats.score_time += score_time
+    return subsets, scores
+
+
+def _score_chunk(subsets, context):
+    tick = time.perf_counter()
+    # one numba thread per worker, the pool provides the parallelism
+    scores = context.score_words_blocked(
+        subsets[:, : context.word_length].numpy().astype(np.uint8),
+        num_threads=1,
+    )
+    return subsets, scores, time.perf_counter() - tick
@@ -1,9 +1,9 @@
 import matplotlib.pyplot as plt
-from pointconfig.lightweight_score import score_thresholds
+from pointconfig.lightweight_score import score_thresholds, DIMENSION
 
 
-def make_thresholds_and_data(prime, total_directions):
-    thresholds = score_thresholds(prime)
+def make_thresholds_and_data(prime, total_directions, dimension=DIMENSION):
+    thresholds = score_thresholds(prime, dimension)
     threshold_data = {
         "max_threshold": max(thresholds),
         "normalization_factor": prime * total_directions,
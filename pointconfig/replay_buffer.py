@@ -0,0 +1,114 @@
+"""
+Replay buffer of elite words kept across training loops. Words are
+stored bit-packed in fixed arrays of capacity rows next to their scores
+and the loop they were added in; a word already held is not added again.
+When full, the rows with the lowest priority are overwritten, the
+priority being the score or the score decayed by age.
+"""
+
+import numpy as np
+import torch
+
+from pointconfig.expand_subset import ExpandedSubsets
+
+# eviction orders
+SCORE = "score"
+AGE_DECAYED = "age_decayed"
+EVICTIONS = (SCORE, AGE_DECAYED)
+
+DECAY = 0.95
+
+
+class ReplayBuffer:
+    """
+    With AGE_DECAYED eviction a word added k loops ago has priority
+    score * decay**k, so old elites make way for slightly worse fresh
+    ones.
+    """
+
+    def __init__(self, capacity, word_length, eviction=SCORE, decay=DECAY):
+        if eviction not in EVICTIONS:
+            raise ValueError(f"Unknown eviction {eviction!r}")
+        self.capacity = capacity
+        self.word_length = word_length
+        self.eviction = eviction
+        self.decay = decay
+        self.size = 0
+        self.loop_num = 0
+        self.packed_words = np.zeros(
+            (capacity, -(-word_length // 8)), dtype=np.uint8
+        )
+        self.scores = np.zeros(capacity)
+        self.loops_added = np.zeros(capacity, dtype=np.int64)
+        # packed words held, for deduplication
+        self._keys = set()
+
+    def __len__(self):
+        return self.size
+
+    def priorities(self, scores, loops_added):
+        if self.eviction == AGE_DECAYED:
+            return scores * self.decay ** (self.loop_num - loops_added)
+        return np.asarray(scores, dtype=np.float64)
+
+    def add(self, subsets, scores, loop_num):
+        """
+        Adds the words (the first word_length columns of subsets, a
+        tensor or an array) not held yet. Returns how many were kept.
+        """
+        self.loop_num = loop_num
+        words = np.asarray(subsets[:, : self.word_length], dtype=np.uint8)
+        packed = np.packbits(words, axis=1)
+        scores = np.asarray(scores, dtype=np.float64)
+        new_rows, batch_keys = [], set()
+        for row, word in enumerate(packed):
+            key = word.tobytes()
+            if key not in self._keys and key not in batch_keys:
+                batch_keys.add(key)
+                new_rows.append(row)
+        packed, scores = packed[new_rows], scores[new_rows]
+
+        free_slots = np.arange(self.size, self.capacity)
+        if self.size + len(new_rows) > self.capacity:
+            priorities = np.concatenate(
+                [
+                    self.priorities(
+                        self.scores[: self.size],
+                        self.loops_added[: self.size],
+                    ),
+                    self.priorities(scores, loop_num),
+                ]
+            )
+            top = np.argpartition(-priorities, self.capacity - 1)
+            kept = np.zeros(len(priorities), dtype=bool)
+            kept[top[: self.capacity]] = True
+            evicted = np.flatnonzero(~kept[: self.size])
+            for slot in evicted:
+                self._keys.discard(self.packed_words[slot].tobytes())
+            free_slots = np.concatenate([free_slots, evicted])
+            packed, scores = (
+                packed[kept[self.size :]],
+                scores[kept[self.size :]],
+            )
+
+        slots = free_slots[: len(packed)]
+        self.packed_words[slots] = packed
+        self.scores[slots] = scores
+        self.loops_added[slots] = loop_num
+        self._keys.update(word.tobytes() for word in packed)
+        self.size = min(self.capacity, self.size + len(packed))
+        return len(packed)
+
+    def sample(self, num_words, stage_encoding):
+        """
+        Training rows (an ExpandedSubsets) of num_words words drawn
+        without replacement, or of every word if fewer are held, and
+        their scores.
+        """
+        chosen = torch.randperm(self.size)[:num_words].numpy()
+        return (
+            ExpandedSubsets.from_packed(
+                self.packed_words[chosen], self.word_length, stage_encoding
+            ),
+            self.scores[chosen],
+        )
@@ -0,0 +1,193 @@
+"""
+Samples and scores subsets from a trained checkpoint without training.
+Chunks are written to an output directory as chunk_<index>.npz holding
+the bit-packed words (np.packbits along each word) and their scores,
+next to sample_info.json with the field they were sampled for. Each
+chunk is written atomically, so an interrupted run loses at most the
+chunks in flight. Asking the same directory for more subsets than it
+holds resumes or extends it with new chunks.
+"""
+
+import json
+import os
+import secrets
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import torch
+
+import pointconfig.lightweight_score as lws
+from pointconfig.checkpoint import load_model
+from pointconfig.compiled_sampler import CompiledSampler
+from pointconfig.lookup_cache import save_atomically
+from pointconfig.make_subset import generate_subsets
+
+CHUNK_SIZE = lws.BATCH_SIZE
+SAMPLE_INFO = "sample_info.json"
+
+# the model each worker process samples from, see _init_worker
+_WORKER = {}
+
+
+def chunk_paths(output):
+    return sorted(Path(output).glob("chunk_*.npz"))
+
+
+def load_chunk(path, word_length):
+    """
+    Unpacked words and scores of one chunk.
+    """
+    with np.load(path) as chunk:
+        words = np.unpackbits(chunk["words"], axis=1, count=word_length)
+        return words, chunk["scores"]
+
+
+def load_samples(output):
+    """
+    All words and scores in output, in chunk order.
+    """
+    word_length = read_sample_info(output)["word_length"]
+    chunks = [load_chunk(path, word_length) for path in chunk_paths(output)]
+    if not chunks:
+        return np.zeros((0, word_length), dtype=np.uint8), np.empty(0)
+    return (
+        np.concatenate([words for words, _ in chunks]),
+        np.concatenate([scores for _, scores in chunks]),
+    )
+
+
+def read_sample_info(output):
+    with open(Path(output) / SAMPLE_INFO, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def sample_to_disk(
+    model_path,
+    output,
+    num_subsets,
+    chunk_size=CHUNK_SIZE,
+    workers=1,
+    compiled=False,
+    seed=None,
+):
+    """
+    Samples from the checkpoint at model_path until output holds
+    num_subsets subsets, chunk_size per chunk, on workers processes
+    (in this process for 0). Chunk k is drawn with a torch seed derived
+    from (seed, k), seed is random if None. Returns the number of
+    subsets written and the samples per second.
+    """
+    _, _, _, _, context, _ = load_model(model_path)
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    info = {
+        "prime": context.prime,
+        "dimension": context.dimension,
+        "word_length": context.word_length,
+    }
+    if (output / SAMPLE_INFO).exists():
+        if read_sample_info(output) != info:
+            raise ValueError(f"{output} holds samples of another field")
+    else:
+        with open(output / SAMPLE_INFO, "w", encoding="utf8") as f:
+            json.dump(info, f, indent=4)
+
+    existing = chunk_paths(output)
+    held = sum(_chunk_length(path) for path in existing)
+    next_index = int(existing[-1].stem.split("_")[1]) + 1 if existing else 0
+    counts = [
+        min(chunk_size, num_subsets - start)
+        for start in range(held, num_subsets, chunk_size)
+    ]
+    indices = range(next_index, next_index + len(counts))
+    if seed is None:
+        seed = secrets.randbits(32)
+
+    start_time = time.perf_counter()
+    written = 0
+    if workers:
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, compiled),
+        ) as pool:
+            for count in pool.map(
+                _sample_chunk, indices, counts, repeat(output), repeat(seed)
+            ):
+                written += count
+                _report(held + written, num_subsets, written, start_time)
+    else:
+        _init_worker(model_path, compiled, torch.get_num_threads())
+        for index, count in zip(indices, counts):
+            written += _sample_chunk(index, count, output, seed)
+            _report(held + written, num_subsets, written, start_time)
+    elapsed = time.perf_counter() - start_time
+    return written, written / elapsed if elapsed else 0.0
+
+
+def _chunk_length(path):
+    with np.load(path) as chunk:
+        return len(chunk["scores"])
+
+
+def _report(held, num_subsets, written, start_time):
+    rate = written / (time.perf_counter() - start_time)
+    print(f"{held}/{num_subsets} subsets, {rate:.1f} samples/s")
+
+
+def _init_worker(model_path, compiled, num_threads=1):
+    # the processes provide the parallelism
+    torch.set_num_threads(num_threads)
+    model, _, _, _, context, _ = load_model(model_path)
+    model.eval()
+    _WORKER["model"] = CompiledSampler(model) if compiled else model
+    _WORKER["context"] = context
+
+
+def _sample_chunk(index, count, output, seed):
+    torch.manual_seed(
+        int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+    )
+    context = _WORKER["context"]
+    subsets, scores = generate_subsets(
+        _WORKER["model"], count, num_threads=1, context=context
+    )
+    words = subsets[:, : context.word_length].numpy().astype(np.uint8)
+    packed = np.packbits(words, axis=1)
+    save_atomically(
+        Path(output) / f"chunk_{index:06d}.npz",
+        lambda f: np.savez(f, words=packed, scores=scores),
+    )
+    return count
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--model_path", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--num_subsets", type=int, required=True)
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--compiled", action="store_true")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    written, rate = sample_to_disk(
+        args.model_path,
+        args.output,
+        args.num_subsets,
+        args.chunk_size,
+        args.workers,
+        args.compiled,
+        args.seed,
+    )
+    print(f"Wrote {written} subsets at {rate:.1f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from pointconfig.subset.subset import Subset
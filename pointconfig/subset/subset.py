@@ -11,14 +11,14 @@ from typing import Optional
 from typing import Set
 from typing import Tuple
 
-import pointconfig.utils as pcutils
-from pointconfig.ambientspace import AmbientSpace
-from pointconfig.config_types import DirectionType
-from pointconfig.config_types import LineIncidenceType
-from pointconfig.config_types import LookupEntryType
-from pointconfig.config_types import PairOfPointsType
-from pointconfig.config_types import PlaneIncidenceType
-from pointconfig.config_types import PointType
+import pointconfig.subset.utils as pcutils
+from pointconfig.subset.ambientspace import AmbientSpace
+from pointconfig.subset.config_types import DirectionType
+from pointconfig.subset.config_types import LineIncidenceType
+from pointconfig.subset.config_types import LookupEntryType
+from pointconfig.subset.config_types import PairOfPointsType
+from pointconfig.subset.config_types import PlaneIncidenceType
+from pointconfig.subset.config_types import PointType
 
 
 class Subset:
@@ -9,10 +9,10 @@ from collections.abc import Generator
 from typing import Dict
 from typing import Tuple
 
-import pointconfig.check_inputs as checks
-from pointconfig.config_types import DirectionType
-from pointconfig.config_types import LookupEntryType
-from pointconfig.config_types import PointType
+import pointconfig.subset.check_inputs as checks
+from pointconfig.subset.config_types import DirectionType
+from pointconfig.subset.config_types import LookupEntryType
+from pointconfig.subset.config_types import PointType
 
 
 def get_directions(
@@ -1,26 +1,56 @@
 import argparse
+import time
 from torch import nn
 from pointconfig.checkpoint import checkpoint, load_checkpoint
-from pointconfig.model import train_model
+from pointconfig.model import (
+    train_model,
+    inference_model,
+    InferenceModel,
+    ONE_HOT,
+    STAGE_ENCODINGS,
+    AUTOREGRESSIVE,
+    MODEL_KINDS,
+    FLOAT32,
+    INFERENCE_PRECISIONS,
+)
 from pointconfig.plot import (
     plot_beginning,
     plot_middle,
     plot_end,
     make_thresholds_and_data,
 )
-from pointconfig.make_subset import generate_subsets, get_highest_subsets
-from pointconfig.expand_subset import expand_subsets
+from pointconfig.compiled_sampler import CompiledSampler
+from pointconfig.make_subset import generate_top_subsets, elite_count
+from pointconfig.expand_subset import ExpandedSubsets
+from pointconfig.pipeline import best_from_pipeline, DEPTH
+from pointconfig.early_rejection import best_from_stream
+from pointconfig.replay_buffer import ReplayBuffer, SCORE, EVICTIONS
 from pointconfig.lightweight_score import (
     BATCH_SIZE,
     PRIME,
-    TOTAL_DIRECTIONS,
+    DIMENSION,
+    get_context,
 )
 
 
-def best_from_model(model, batch_size, percentile=90):
-    """returns a tuple of best subset and best scores"""
-    all_subsets, scores = generate_subsets(model, batch_size)
-    return get_highest_subsets(all_subsets, scores, percentile)
+def best_from_model(
+    model,
+    batch_size,
+    percentile=90,
+    num_threads=None,
+    context=None,
+    chunk_size=BATCH_SIZE,
+):
+    """returns a tuple of best subset and best scores, batch_size
+    subsets are drawn chunk_size at a time"""
+    return generate_top_subsets(
+        model,
+        batch_size,
+        elite_count(batch_size, percentile),
+        chunk_size,
+        num_threads,
+        context,
+    )
 
 
 def train(
@@ -29,38 +59,145 @@ def train(
     plot=True,
     save_checkpoint=True,
     save_path=None,
+    scoring_threads=None,
+    prime=PRIME,
+    dimension=DIMENSION,
+    stage_encoding=ONE_HOT,
+    pipeline_workers=0,
+    pipeline_depth=DEPTH,
+    early_rejection=False,
+    samples_per_loop=BATCH_SIZE,
+    elite_percentile=90,
+    inference_precision=FLOAT32,
+    compiled_sampler=False,
+    model_kind=AUTOREGRESSIVE,
+    prefix_sum_training=False,
+    replay_capacity=0,
+    replay_eviction=SCORE,
+    replay_batch=None,
 ):
-    """Trains, plots, and checkpoints"""
+    """
+    Trains, plots, and checkpoints. When resuming from save_path the
+    prime, dimension and stage encoding stored in the checkpoint are used.
+    With pipeline_workers, sampling overlaps scoring on that many threads
+    (see pipeline.sample_and_score) and stage utilisation is printed.
+    With early_rejection, rows that can no longer beat the previous
+    loop's elites are dropped mid-sample (see early_rejection).
+    Every loop trains on the subsets above elite_percentile of
+    samples_per_loop draws, which are sampled BATCH_SIZE at a time.
+    Sampling runs the network in inference_precision (see
+    model.InferenceModel), refreshed from the training weights each loop.
+    compiled_sampler samples with a CompiledSampler and needs the float32
+    inference precision; the early rejection sampler keeps its own loop.
+    model_kind picks the autoregressive MLP or the factorized (independent
+    bits) model for a new run, and the CPU time spent finding each loop's
+    elites is printed to compare them. prefix_sum_training trains on
+    whole elite words at a time (see model.train_model). With a
+    replay_capacity the elites go into a ReplayBuffer of that many words
+    and each loop trains on replay_batch words drawn from it (as many as
+    the loop's elites by default).
+    """
+    if compiled_sampler and inference_precision != FLOAT32:
+        raise ValueError("compiled_sampler needs float32 inference_precision")
     if plot:
         fig, ax_top, ax_bottom = plot_beginning()
     else:
         fig = None
 
-    threshold_data = make_thresholds_and_data(PRIME, TOTAL_DIRECTIONS)
     complete_model_info, training_tracker, base_loop_num = load_checkpoint(
-        save_path, top_examples
+        save_path,
+        top_examples,
+        get_context(prime, dimension),
+        stage_encoding,
+        model_kind,
+    )
+    context = complete_model_info["context"]
+    stage_encoding = complete_model_info["stage_encoding"]
+    threshold_data = make_thresholds_and_data(
+        context.prime, context.total_directions, context.dimension
     )
     first_save = bool(save_path is None)
+    elite_bar = None
+    sampler = None
+    replay_buffer = None
+    if replay_capacity:
+        replay_buffer = ReplayBuffer(
+            replay_capacity, context.word_length, replay_eviction
+        )
     for loop_num in range(loops):
         complete_model_info["model"].eval()
-        best_subsets, best_scores = best_from_model(
-            complete_model_info["model"], BATCH_SIZE
+        if sampler is None:
+            sampler = inference_model(
+                complete_model_info["model"], inference_precision
+            )
+            if compiled_sampler:
+                sampler = CompiledSampler(sampler)
+        elif isinstance(sampler, InferenceModel):
+            sampler.refresh()
+        tick = time.process_time()
+        if early_rejection:
+            best_subsets, best_scores, rejection_stats = best_from_stream(
+                (
+                    sampler.model
+                    if isinstance(sampler, CompiledSampler)
+                    else sampler
+                ),
+                BATCH_SIZE,
+                elite_percentile,
+                threshold=elite_bar,
+                context=context,
+                num_samples=samples_per_loop,
+            )
+            elite_bar = best_scores.min()
+            print(f"Early rejection: {rejection_stats.summary()}")
+        elif pipeline_workers:
+            best_subsets, best_scores, pipeline_stats = best_from_pipeline(
+                sampler,
+                samples_per_loop,
+                elite_percentile,
+                depth=pipeline_depth,
+                workers=pipeline_workers,
+                context=context,
+            )
+            print(f"Pipeline: {pipeline_stats.summary()}")
+        else:
+            best_subsets, best_scores = best_from_model(
+                sampler,
+                samples_per_loop,
+                elite_percentile,
+                num_threads=scoring_threads,
+                context=context,
+            )
+        sample_cpu_time = time.process_time() - tick
+        training_tracker.update_best_examples(
+            best_subsets, best_scores, context
         )
-        training_tracker.update_best_examples(best_subsets, best_scores)
 
-        training_set = expand_subsets(best_subsets)
+        if replay_buffer is None:
+            training_set = ExpandedSubsets(
+                best_subsets, context.word_length, stage_encoding
+            )
+        else:
+            replay_buffer.add(
+                best_subsets, best_scores, base_loop_num + loop_num
+            )
+            training_set, _ = replay_buffer.sample(
+                replay_batch or len(best_scores), stage_encoding
+            )
         loss = train_model(
             training_set,
             complete_model_info["model"],
             complete_model_info["loss_function"],
             complete_model_info["optimizer"],
             shuffle=True,
+            prefix_sums=prefix_sum_training,
         )
         training_tracker.tracking_lists["loss"].append(loss)
         print(
             f"At {base_loop_num + loop_num + 1}, Loss: "
             f"{training_tracker.tracking_lists['loss'][-1]}\n"
-            f"Best scores mean: {best_scores.mean()}"
+            f"Best scores mean: {best_scores.mean()}\n"
+            f"{len(best_scores)} elites in {sample_cpu_time:.2f} CPU seconds"
         )
 
         training_tracker.update_lists(
@@ -93,11 +230,55 @@ def train(
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model_path")
+    parser.add_argument("--scoring_threads", type=int)
+    parser.add_argument("--prime", type=int, default=PRIME)
+    parser.add_argument("--dimension", type=int, default=DIMENSION)
+    parser.add_argument(
+        "--stage_encoding", choices=STAGE_ENCODINGS, default=ONE_HOT
+    )
+    parser.add_argument("--pipeline_workers", type=int, default=0)
+    parser.add_argument("--pipeline_depth", type=int, default=DEPTH)
+    parser.add_argument("--early_rejection", action="store_true")
+    parser.add_argument("--samples_per_loop", type=int, default=BATCH_SIZE)
+    parser.add_argument("--elite_percentile", type=float, default=90)
+    parser.add_argument(
+        "--inference_precision", choices=INFERENCE_PRECISIONS, default=FLOAT32
+    )
+    parser.add_argument("--compiled_sampler", action="store_true")
+    parser.add_argument(
+        "--model_kind", choices=MODEL_KINDS, default=AUTOREGRESSIVE
+    )
+    parser.add_argument("--prefix_sum_training", action="store_true")
+    parser.add_argument("--replay_capacity", type=int, default=0)
+    parser.add_argument("--replay_eviction", choices=EVICTIONS, default=SCORE)
+    parser.add_argument("--replay_batch", type=int)
     args = parser.parse_args()
-    if args.model_path:
-        train(plot=False, save_path=args.model_path)
-    else:
-        train(plot=False)
+    if args.samples_per_loop < 1 or not 0 <= args.elite_percentile < 100:
+        parser.error(
+            "--samples_per_loop and --elite_percentile keep no elites"
+        )
+    if args.compiled_sampler and args.inference_precision != FLOAT32:
+        parser.error("--compiled_sampler needs --inference_precision float32")
+    train(
+        plot=False,
+        save_path=args.model_path,
+        scoring_threads=args.scoring_threads,
+        prime=args.prime,
+        dimension=args.dimension,
+        stage_encoding=args.stage_encoding,
+        pipeline_workers=args.pipeline_workers,
+        pipeline_depth=args.pipeline_depth,
+        early_rejection=args.early_rejection,
+        samples_per_loop=args.samples_per_loop,
+        elite_percentile=args.elite_percentile,
+        inference_precision=args.inference_precision,
+        compiled_sampler=args.compiled_sampler,
+        model_kind=args.model_kind,
+        prefix_sum_training=args.prefix_sum_training,
+        replay_capacity=args.replay_capacity,
+        replay_eviction=args.replay_eviction,
+        replay_batch=args.replay_batch,
+    )
 
 
 if __name__ == "__main__":
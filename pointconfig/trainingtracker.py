@@ -1,6 +1,6 @@
 import heapq
 import numpy as np
-from pointconfig.lightweight_score import _true_word_from_word
+import pointconfig.lightweight_score as lws
 
 
 class TrainingTracker:
@@ -33,9 +33,11 @@ class TrainingTracker:
             update_info["scores_this_loop"]
         )
 
-    def update_best_examples(self, best_subsets, best_scores):
+    def update_best_examples(self, best_subsets, best_scores, context=None):
+        if context is None:
+            context = lws.DEFAULT_CONTEXT
         for score, subset in zip(best_scores, best_subsets):
-            subset = _true_word_from_word(subset.numpy())
+            subset = context.true_word_from_word(subset.numpy())
             str_subset = "".join(
                 [str(int(inout)) for inout in subset.tolist()]
             )
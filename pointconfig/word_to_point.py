@@ -1,5 +1,4 @@
 from pointconfig.lightweight_utils import index_to_point, index_to_direction
-from pointconfig.lightweight_score import TOTAL_DIRECTIONS
 from numba import njit
 
 
@@ -15,7 +14,8 @@ def word_to_point(word, prime, dimension):
 
 def check_equidistribution(point_set, prime, dimension):
     equidistributed_directions = set()
-    for direction_index in range(TOTAL_DIRECTIONS):
+    total_directions = ((prime**dimension) - 1) // (prime - 1)
+    for direction_index in range(total_directions):
         direction = index_to_direction(prime, dimension, direction_index)
         tracker = [0] * prime
         for point in point_set:
@@ -4,8 +4,8 @@ Test bad input handling
 
 import pytest
 
-from pointconfig.check_inputs import check_prime_dim
-from pointconfig.check_inputs import check_prime_dim_point_dir
+from pointconfig.subset.check_inputs import check_prime_dim
+from pointconfig.subset.check_inputs import check_prime_dim_point_dir
 
 
 @pytest.mark.parametrize("prime, dim", [(-1, 7), (7, -4), (-7, -4)])
@@ -0,0 +1,71 @@
+"""
+Tests for data-parallel training
+"""
+
+import torch
+
+import pointconfig.checkpoint as cp
+import pointconfig.distributed as pcd
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+from pointconfig.expand_subset import expand_subsets
+from pointconfig.trainingtracker import TrainingTracker
+
+
+def test_shard_gradients_sum_to_minibatch_gradient() -> None:
+    """
+    The shards' gradients add up to the whole minibatch's gradient,
+    including a rank left without rows.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    model = pcm.make_model(word_length)
+    subsets = torch.zeros((3, 2 * word_length))
+    subsets[:, :word_length] = (torch.rand(3, word_length) < 0.5).float()
+    rows = expand_subsets(subsets, word_length)
+    loss_function = torch.nn.BCELoss()
+
+    expected = torch.autograd.grad(
+        loss_function(model(rows[:, :-1]), rows[:, -1:]),
+        list(model.parameters()),
+    )
+    shard_size = -(-len(rows) // 3)
+    summed = [torch.zeros_like(gradient) for gradient in expected]
+    for rank in range(4):
+        shard = rows[rank * shard_size : (rank + 1) * shard_size]
+        loss = pcd._shard_loss(shard, model, loss_function, len(rows))
+        for total, gradient in zip(
+            summed, torch.autograd.grad(loss, list(model.parameters()))
+        ):
+            total += gradient
+    for total, gradient in zip(summed, expected):
+        assert torch.allclose(total, gradient, atol=1e-6)
+
+
+def test_two_ranks_resume_and_checkpoint(tmp_path) -> None:
+    """
+    Two gloo ranks train from a checkpoint and rank 0 writes the next.
+    """
+    complete_model_info = pcm.model_info(lws.get_context(7, 3))
+    cp.checkpoint(1, complete_model_info, TrainingTracker(10), False, tmp_path)
+    pcd.train_distributed(
+        world_size=2,
+        loops=2,
+        save_path=tmp_path,
+        prime=7,
+        dimension=3,
+        samples_per_loop=40,
+        checkpoint_every=2,
+        seed=0,
+    )
+    model_paths = list(tmp_path.glob("model*.pt"))
+    assert len(model_paths) == 1
+    model, _, loop_num, tracker, context, _ = cp.load_model(model_paths[0])
+    assert loop_num == 3 and context is lws.get_context(7, 3)
+    assert len(tracker.tracking_lists["loss"]) == 2
+    assert not all(
+        torch.equal(trained, initial)
+        for trained, initial in zip(
+            model.parameters(), complete_model_info["model"].parameters()
+        )
+    )
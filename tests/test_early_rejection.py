@@ -0,0 +1,69 @@
+"""
+Tests for the early rejection streaming sampler
+"""
+
+import numpy as np
+import torch
+
+import pointconfig.early_rejection as er
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+
+
+def test_bounds_hold_for_every_prefix() -> None:
+    """
+    No word scores above the bound of any of its prefixes.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(3)
+    words = np.zeros((80, context.word_length), dtype=np.uint8)
+    for number, word in enumerate(words):
+        # packed words fail planes or lines, spread ones get further
+        candidates = context.word_length if number % 2 else 49
+        size = rng.integers(2, 6) * 7 - len(context.fixed_indices)
+        word[rng.choice(candidates, size, False)] = 1
+    scores = context.score_words(words)
+    assert scores.max() > 2 * scores.min()
+    tightest = np.full(len(words), np.inf)
+    for stage in range(0, context.word_length + 1, 4):
+        bounds = er.prefix_upper_bounds(words, stage, context)
+        assert (bounds >= scores).all()
+        tightest = np.minimum(tightest, bounds)
+    # full words are bounded by their own stage results
+    full = er.prefix_upper_bounds(words, context.word_length, context)
+    assert (full >= scores).all()
+    assert (tightest < full.max()).any()
+
+
+def test_stream_elites() -> None:
+    """
+    Elites are completed words with their true scores, best first, and a
+    high bar retires rows without losing the requested elites.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.make_model(context.word_length)
+
+    subsets, scores, stats = er.stream_elites(
+        model, 10, batch_size=40, max_steps=100, threshold=1e9, context=context
+    )
+    assert subsets.shape == (10, 2 * context.word_length)
+    words = subsets[:, : context.word_length].numpy().astype(np.uint8)
+    assert np.array_equal(scores, context.score_words(words))
+    assert (np.diff(scores) <= 0).all()
+    assert stats.retired > 0 and stats.completed >= 40
+    # nothing can beat the bar, so rows only complete after max_steps
+    assert stats.steps > 100
+    assert stats.started == 40 + stats.completed + stats.retired
+    assert "retired" in stats.summary()
+
+
+def test_best_from_stream_size() -> None:
+    """
+    Keeps the same number of elites as best_from_model.
+    """
+    context = lws.get_context(5, 3)
+    model = pcm.make_model(context.word_length, pcm.EMBEDDING)
+    subsets, scores, _ = er.best_from_stream(model, 50, context=context)
+    assert len(subsets) == len(scores) == 5
+    assert subsets.shape[1] == context.word_length
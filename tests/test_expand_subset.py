@@ -0,0 +1,118 @@
+"""
+Tests for building training rows from subsets
+"""
+
+import pytest
+import torch
+
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+from pointconfig.expand_subset import ExpandedSubsets, expand_subsets
+
+
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_lazy_rows_match_dense(stage_encoding) -> None:
+    """
+    Rows built on demand are the rows of expand_subsets.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    subsets = torch.zeros((6, pcm.subset_width(word_length, stage_encoding)))
+    subsets[:, :word_length] = (torch.rand(6, word_length) < 0.5).float()
+    dense = expand_subsets(subsets, word_length, stage_encoding)
+    lazy = ExpandedSubsets(subsets, word_length, stage_encoding)
+    assert len(lazy) == len(dense)
+    indices = torch.randperm(len(dense))[:50]
+    assert torch.equal(lazy.rows(indices), dense[indices])
+
+
+@pytest.mark.parametrize("shuffle", (True, False))
+def test_training_on_lazy_rows_matches_dense(shuffle) -> None:
+    """
+    With the same permutation train_model takes the same steps.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    subsets = torch.zeros((20, 2 * word_length))
+    subsets[:, :word_length] = (torch.rand(20, word_length) < 0.5).float()
+    losses, models = [], []
+    for data in (
+        expand_subsets(subsets, word_length),
+        ExpandedSubsets(subsets, word_length),
+    ):
+        torch.manual_seed(1)
+        complete_model_info = pcm.model_info(lws.get_context(5, 3))
+        losses.append(
+            pcm.train_model(
+                data,
+                complete_model_info["model"],
+                complete_model_info["loss_function"],
+                complete_model_info["optimizer"],
+                batch_size=256,
+                shuffle=shuffle,
+            )
+        )
+        models.append(complete_model_info["model"])
+    assert losses[0] == losses[1]
+    for dense, lazy in zip(models[0].parameters(), models[1].parameters()):
+        assert torch.equal(dense, lazy)
+
+
+@pytest.mark.parametrize(
+    "stage_encoding, model_kind",
+    (
+        (pcm.ONE_HOT, pcm.AUTOREGRESSIVE),
+        (pcm.EMBEDDING, pcm.AUTOREGRESSIVE),
+        (pcm.EMBEDDING, pcm.FACTORIZED),
+    ),
+)
+def test_prefix_sum_gradients_match_rows(stage_encoding, model_kind) -> None:
+    """
+    The whole-word prefix sum loss and its gradients are those of the
+    expanded rows of the same words.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    model = pcm.make_model(word_length, stage_encoding, model_kind)
+    with torch.no_grad():
+        for parameter in model.parameters():
+            parameter.normal_(std=0.1)
+    subsets = torch.zeros((4, pcm.subset_width(word_length, stage_encoding)))
+    subsets[:, :word_length] = (torch.rand(4, word_length) < 0.5).float()
+    rows = expand_subsets(subsets, word_length, stage_encoding)
+    loss_function = torch.nn.BCELoss()
+
+    row_loss = loss_function(model(rows[:, :-1]), rows[:, -1:])
+    row_gradients = torch.autograd.grad(row_loss, list(model.parameters()))
+    words = ExpandedSubsets(subsets, word_length, stage_encoding).words(
+        torch.arange(4)
+    )
+    word_loss = pcm._word_stages_loss(words, model, loss_function)
+    word_gradients = torch.autograd.grad(word_loss, list(model.parameters()))
+    assert torch.allclose(word_loss, row_loss, atol=1e-6)
+    for word_gradient, row_gradient in zip(word_gradients, row_gradients):
+        assert torch.allclose(word_gradient, row_gradient, atol=1e-6)
+
+
+def test_prefix_sum_training_learns() -> None:
+    """
+    train_model with prefix_sums lowers the loss on repeated words.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    subsets = torch.zeros((8, 2 * word_length))
+    subsets[:, : word_length // 2] = 1.0
+    data = ExpandedSubsets(subsets, word_length)
+    complete_model_info = pcm.model_info(lws.get_context(5, 3))
+    losses = [
+        pcm.train_model(
+            data,
+            complete_model_info["model"],
+            complete_model_info["loss_function"],
+            complete_model_info["optimizer"],
+            batch_size=2 * word_length,
+            prefix_sums=True,
+        )
+        for _ in range(5)
+    ]
+    assert losses[-1] < losses[0]
@@ -0,0 +1,48 @@
+"""
+Tests for the island model
+"""
+
+import json
+
+import pointconfig.islands as isl
+
+
+def test_merge_top_examples() -> None:
+    """
+    Merging keeps the best distinct subsets over all islands.
+    """
+    merged = isl.merge_top_examples(
+        [[(3.0, "011"), (5.0, "110")], [(5.0, "110"), (4.0, "101")], []],
+        2,
+    )
+    assert merged == [(5.0, "110"), (4.0, "101")]
+
+
+def test_islands_migrate_and_merge(tmp_path) -> None:
+    """
+    Two islands exchanging elites every loop finish and write one
+    merged top_examples.json plus their own checkpoints.
+    """
+    merged = isl.run_islands(
+        2,
+        tmp_path,
+        loops=2,
+        migration_interval=1,
+        migrants=3,
+        top_examples=5,
+        prime=7,
+        dimension=3,
+        samples_per_loop=40,
+        checkpoint_every=2,
+    )
+    assert 0 < len(merged) <= 5
+    assert [score for score, _ in merged] == sorted(
+        (score for score, _ in merged), reverse=True
+    )
+    with open(tmp_path / "top_examples.json", encoding="utf8") as f:
+        saved = json.load(f)
+    assert [pair["subset"] for pair in saved.values()] == [
+        subset for _, subset in merged
+    ]
+    for island in range(2):
+        assert list((tmp_path / f"island_{island}").glob("model*.pt"))
@@ -0,0 +1,93 @@
+"""
+Tests for incremental scoring of single point flips
+"""
+
+import numpy as np
+import pytest
+
+import pointconfig.lightweight_score as lws
+from pointconfig.lightweight_delta import IncrementalScorer
+
+
+def sized_word(context, num_points, rng):
+    """
+    Random word with num_points points besides the fixed ones.
+    """
+    word = np.zeros(context.word_length, dtype=np.uint8)
+    word[rng.choice(context.word_length, num_points, replace=False)] = 1
+    return word
+
+
+@pytest.mark.parametrize("prime, dimension", [(5, 3), (7, 3), (7, 2)])
+def test_flips_match_full_scoring(prime, dimension) -> None:
+    """
+    After every flip the incremental score equals rescoring the word.
+    """
+    context = lws.get_context(prime, dimension)
+    rng = np.random.default_rng(prime * dimension)
+    # sizes around 3 * prime so the line and equidistribution terms count
+    word = sized_word(context, 3 * prime - dimension - 1, rng)
+    scorer = IncrementalScorer(context, word)
+    assert scorer.score() == context.score_word(word)
+    for position in rng.integers(context.word_length, size=300):
+        score = scorer.flip(position)
+        word[position] ^= 1
+        assert np.array_equal(scorer.word, word)
+        assert score == context.score_word(word)
+
+
+def test_swaps_at_valid_size() -> None:
+    """
+    Swapping a point in for a point out keeps the size a valid multiple,
+    so the line and equidistribution terms are exercised in 3d.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(1)
+    word = sized_word(context, 17, rng)
+    scorer = IncrementalScorer(context, word)
+    scores = set()
+    for _ in range(200):
+        position_in = rng.choice(np.flatnonzero(word))
+        position_out = rng.choice(np.flatnonzero(word == 0))
+        scorer.flip(position_in)
+        score = scorer.flip(position_out)
+        word[position_in] = 0
+        word[position_out] = 1
+        assert score == context.score_word(word)
+        scores.add(score)
+    # size, every plane and every line passed, so equidistribution counted
+    all_cells = context.total_directions * 7**3
+    assert max(scores) > 7 + 7**2 + 2 * all_cells
+
+
+def test_incidence_matches_rebuild() -> None:
+    """
+    Adding then removing points leaves the same state as building fresh.
+    """
+    context = lws.get_context(5, 3)
+    rng = np.random.default_rng(0)
+    start = sized_word(context, 20, rng)
+    end = sized_word(context, 20, rng)
+    scorer = IncrementalScorer(context, start)
+    scorer.set_word(end)
+    fresh = IncrementalScorer(context, end)
+    assert scorer.size == fresh.size == 24
+    assert np.array_equal(scorer.plane_incidence, fresh.plane_incidence)
+    assert np.array_equal(scorer.line_incidence, fresh.line_incidence)
+    assert np.array_equal(scorer.line_value_counts, fresh.line_value_counts)
+    assert np.array_equal(scorer.plane_totals, fresh.plane_totals)
+
+
+def test_fixed_and_missing_points() -> None:
+    """
+    Fixed points stay put and missing points cannot be removed.
+    """
+    scorer = IncrementalScorer(lws.get_context(3, 3))
+    assert scorer.size == 4
+    with pytest.raises(ValueError):
+        scorer.remove_point(0)
+    with pytest.raises(KeyError):
+        scorer.remove_point(2)
+    scorer.add_point(2)
+    scorer.add_point(2)
+    assert scorer.size == 5
@@ -0,0 +1,127 @@
+"""
+Cross checks for the Fourier equidistribution engine
+"""
+
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+import pointconfig.lightweight_fourier as lwf
+import pointconfig.lightweight_score as lws
+from pointconfig.examine_top_examples import check_from_json
+from pointconfig.lightweight_utils import index_to_direction
+from pointconfig.subset import Subset
+from pointconfig.word_to_point import check_equidistribution
+from pointconfig.word_to_point import word_to_point
+
+
+def sample_true_words(prime, dimension, rng):
+    """
+    Random subsets plus a full line and a full plane, which are
+    equidistributed along many (but not all) directions.
+    """
+    total_points = prime**dimension
+    true_words = (rng.random((12, total_points)) < 0.3).astype(np.uint8)
+    points = np.array(list(itertools.product(range(prime), repeat=dimension)))
+    line = np.zeros(total_points, dtype=np.uint8)
+    line[(points[:, :-1] == 0).all(axis=1)] = 1
+    plane = np.zeros(total_points, dtype=np.uint8)
+    plane[(points.sum(axis=1) % prime) == 1] = 1
+    empty = np.zeros(total_points, dtype=np.uint8)
+    return np.vstack([true_words, line, plane, empty])
+
+
+def direction_set(prime, dimension, mask_row):
+    return {
+        tuple(int(c) for c in index_to_direction(prime, dimension, index))
+        for index in np.flatnonzero(mask_row)
+    }
+
+
+@pytest.mark.parametrize("prime, dimension", [(3, 2), (5, 3), (7, 3), (3, 4)])
+def test_counts_match_lookup(prime, dimension) -> None:
+    """
+    Plane counts agree with summing the plane lookup rows.
+    """
+    context = lws.get_context(prime, dimension)
+    rng = np.random.default_rng(prime + dimension)
+    true_words = sample_true_words(prime, dimension, rng)
+    counts = lwf.plane_counts(true_words, prime, dimension, chunk_size=5)
+    directions = np.arange(context.total_directions)
+    for true_word, word_counts in zip(true_words, counts):
+        expected = np.zeros((context.total_directions, prime), dtype=int)
+        for point in np.flatnonzero(true_word):
+            expected[directions, context.plane_lookup[point]] += 1
+        assert np.array_equal(word_counts, expected)
+
+
+@pytest.mark.parametrize("prime, dimension", [(3, 2), (5, 3), (3, 3)])
+def test_mask_matches_subset_and_word_to_point(
+    prime, dimension, monkeypatch
+) -> None:
+    """
+    The equidistributed directions agree with the Subset class and the
+    pure python check.
+    """
+    # keep the shared Subset lookup as the subset tests expect to find it
+    monkeypatch.setattr(Subset, "_LOOKUP", {})
+    rng = np.random.default_rng(prime * dimension)
+    true_words = sample_true_words(prime, dimension, rng)
+    mask, _ = lwf.equidistribution(true_words, prime, dimension)
+    assert mask[-3:].any(axis=1).all()
+    for true_word, mask_row in zip(true_words, mask):
+        found = direction_set(prime, dimension, mask_row)
+        point_set = {
+            tuple(int(c) for c in point)
+            for point in itertools.product(range(prime), repeat=dimension)
+            if true_word[np.ravel_multi_index(point, (prime,) * dimension)]
+        }
+        assert found == check_equidistribution(point_set, prime, dimension)
+        subset = Subset(prime, dimension)
+        for point in point_set:
+            subset.add_point(point)
+        assert found == subset.equidistributed_planes
+
+
+def test_words_match_score_kernel() -> None:
+    """
+    The mask agrees with the zero spread directions the scorer rewards.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(2)
+    words = np.zeros((30, context.word_length), dtype=np.uint8)
+    for word in words:
+        word[rng.choice(context.word_length, 17, replace=False)] = 1
+    mask, counts = lwf.equidistribution_from_words(words, context)
+    for word, mask_row, word_counts in zip(words, mask, counts):
+        assert word_counts.sum(axis=1).tolist() == [21] * len(mask_row)
+        assert np.array_equal(mask_row, np.ptp(word_counts, axis=1) == 0)
+        true_word = context.true_word_from_word(word)
+        assert np.array_equal(
+            lwf.true_words_from_words(word[None], context)[0], true_word
+        )
+
+
+def test_check_from_json(tmp_path) -> None:
+    """
+    The batched check counts the same directions as the old loop.
+    """
+    rng = np.random.default_rng(4)
+    true_words = sample_true_words(3, 3, rng)
+    examples = {
+        i: {"score": 0, "subset": "".join(str(b) for b in word)}
+        for i, word in enumerate(true_words)
+    }
+    path = tmp_path / "top_examples.json"
+    path.write_text(json.dumps(examples), encoding="utf8")
+    expected = [
+        len(
+            check_equidistribution(
+                word_to_point(example["subset"], 3, 3), 3, 3
+            )
+        )
+        for example in examples.values()
+    ]
+    assert check_from_json(path, 3, 3) == expected
@@ -0,0 +1,81 @@
+"""
+Tests for the per direction plane incidence heaps
+"""
+
+import numpy as np
+import pytest
+
+import pointconfig.lightweight_heap as lwh
+
+
+def check_heap(prime, heap_pairs, heap_positions, incidence, sign) -> None:
+    """
+    Heap property holds, positions are consistent and keys match.
+    """
+    for direction in range(incidence.shape[0]):
+        for position in range(prime):
+            value, plane = heap_pairs[direction, position]
+            assert heap_positions[direction, plane] == position
+            assert value == sign * incidence[direction, plane]
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < prime:
+                    assert value <= heap_pairs[direction, child, 0]
+
+
+@pytest.mark.parametrize("prime, total_directions", [(2, 3), (5, 31), (11, 7)])
+def test_random_updates(prime, total_directions) -> None:
+    """
+    Peeks track the true min and max through increments and decrements.
+    """
+    rng = np.random.default_rng(prime)
+    incidence = np.zeros((total_directions, prime), dtype=np.int64)
+    min_pairs, min_positions = lwh.make_heap(total_directions, prime)
+    max_pairs, max_positions = lwh.make_heap(total_directions, prime)
+    for _ in range(2000):
+        direction = rng.integers(total_directions)
+        plane = rng.integers(prime)
+        if incidence[direction, plane] > 0 and rng.random() < 0.4:
+            incidence[direction, plane] -= 1
+            lwh.decrement_both(
+                prime,
+                direction,
+                plane,
+                min_pairs,
+                min_positions,
+                max_pairs,
+                max_positions,
+            )
+        else:
+            incidence[direction, plane] += 1
+            lwh.increment_both(
+                prime,
+                direction,
+                plane,
+                min_pairs,
+                min_positions,
+                max_pairs,
+                max_positions,
+            )
+        assert lwh.peek_min(direction, min_pairs) == incidence[direction].min()
+        assert lwh.peek_max(direction, max_pairs) == incidence[direction].max()
+        assert lwh.plane_spread(direction, min_pairs, max_pairs) == np.ptp(
+            incidence[direction]
+        )
+    check_heap(prime, min_pairs, min_positions, incidence, 1)
+    check_heap(prime, max_pairs, max_positions, incidence, -1)
+
+
+def test_single_heap() -> None:
+    """
+    increment_plane and decrement_plane work on a lone min heap.
+    """
+    heap_pairs, heap_positions = lwh.make_heap(1, 4)
+    for plane in (0, 0, 1, 2, 3, 3, 3):
+        lwh.increment_plane(4, 0, plane, heap_pairs, heap_positions)
+    assert lwh.peek_min(0, heap_pairs) == 1
+    lwh.decrement_plane(0, 3, heap_pairs, heap_positions)
+    lwh.decrement_plane(0, 3, heap_pairs, heap_positions)
+    lwh.decrement_plane(0, 3, heap_pairs, heap_positions)
+    assert lwh.peek_min(0, heap_pairs) == 0
+    assert heap_pairs[0, 0, 1] == 3
+    check_heap(4, heap_pairs, heap_positions, np.array([[2, 1, 1, 0]]), 1)
@@ -0,0 +1,313 @@
+"""
+Tests for the lightweight scoring kernels
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import pointconfig.lightweight_score as lws
+
+
+def random_words(num_words, density, seed=0):
+    """
+    Random batch of words with roughly density * WORD_LENGTH points.
+    """
+    rng = np.random.default_rng(seed)
+    return (rng.random((num_words, lws.WORD_LENGTH)) < density).astype(
+        np.uint8
+    )
+
+
+@pytest.mark.parametrize("num_words", [1, 7, 250])
+def test_parallel_matches_serial(num_words) -> None:
+    """
+    The parallel batch scorer must agree exactly with score_word
+    for batch sizes other than BATCH_SIZE.
+    """
+    words = random_words(num_words, 0.03, seed=num_words)
+    # make sure some of the words get past the size section
+    for word in words[::3]:
+        word[:] = 0
+        word[: 5 * lws.PRIME - 4] = 1
+    serial = np.array([lws.score_word(word) for word in words])
+    parallel = lws.score_words_parallel(words)
+    assert np.array_equal(parallel, serial)
+
+
+def test_parallel_matches_score_words() -> None:
+    """
+    On a full batch the parallel scorer agrees with score_words.
+    """
+    words = random_words(lws.BATCH_SIZE, 0.02)
+    assert np.array_equal(
+        lws.score_words_parallel(words, num_threads=1),
+        lws.score_words(words),
+    )
+
+
+def test_contexts_are_cached() -> None:
+    """
+    One context per (prime, dimension), the default one is shared.
+    """
+    assert lws.get_context() is lws.DEFAULT_CONTEXT
+    assert lws.get_context(5, 3) is lws.get_context(5, 3)
+    assert lws.get_context(5, 3) is not lws.get_context(7, 3)
+
+
+@pytest.mark.parametrize("prime, dimension", [(3, 2), (5, 3), (7, 3)])
+def test_context_sizes(prime, dimension) -> None:
+    """
+    Sizes and lookup shapes follow the prime and dimension.
+    """
+    context = lws.get_context(prime, dimension)
+    assert context.total_points == prime**dimension
+    assert context.word_length == prime**dimension - dimension - 1
+    assert len(context.valid_indices) == context.word_length
+    assert context.plane_lookup.shape == (
+        prime**dimension,
+        context.total_directions,
+    )
+    assert context.line_lookup.max() < context.total_line_intercepts
+
+
+def test_context_scores_every_field() -> None:
+    """
+    Words of a valid size in a smaller field get past the size section
+    and all of the scoring entry points agree.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(3)
+    words = np.zeros((20, context.word_length), dtype=np.uint8)
+    for word in words:
+        # size 21 = 3 * 7 once the four fixed points are added
+        word[rng.choice(context.word_length, 17, replace=False)] = 1
+    scores = context.score_words(words)
+    assert np.array_equal(context.score_words_parallel(words), scores)
+    assert np.array_equal([context.score_word(word) for word in words], scores)
+    assert (scores > 7 + 7**2).all()
+
+
+def reference_score(context, word):
+    """
+    Straightforward numpy version of the score, every stage computed.
+    """
+    prime = context.prime
+    size = len(context.fixed_indices) + int(word.sum())
+    if size % prime != 0:
+        symmetric = min(size % prime, prime - size % prime)
+        return (prime - 1) // 2 - symmetric
+    multiple = size // prime
+    if multiple <= 2 or prime - 2 <= multiple:
+        return prime + prime**2 - multiple
+    score = prime + prime**2
+
+    points = np.flatnonzero(context.true_word_from_word(word))
+    directions = np.arange(context.total_directions)
+    plane_incidence = np.zeros((context.total_directions, prime), int)
+    line_incidence = np.zeros(
+        (context.total_directions, context.total_line_intercepts), int
+    )
+    for point in points:
+        plane_incidence[directions, context.plane_lookup[point]] += 1
+        line_incidence[directions, context.line_lookup[point]] += 1
+
+    plane_cells = context.total_line_intercepts
+    plane_scores = np.where(
+        plane_incidence <= prime, plane_cells, plane_cells - plane_incidence
+    )
+    score += plane_scores.sum()
+    if (plane_incidence > prime).any():
+        return score
+    line_threshold = min(multiple, prime - multiple)
+    line_scores = np.where(
+        line_incidence <= line_threshold, prime, prime - line_incidence
+    )
+    score += line_scores.sum()
+    if (line_incidence > line_threshold).any():
+        return score
+    spreads = np.ptp(plane_incidence, axis=1)
+    return (
+        score
+        + np.where(
+            spreads == 0, prime * context.total_directions, prime - spreads
+        ).sum()
+    )
+
+
+@pytest.mark.parametrize("prime", [7, 11])
+def test_staged_matches_reference(prime) -> None:
+    """
+    Skipping the line pass when a plane fails does not change any score.
+    """
+    context = lws.get_context(prime, 3)
+    rng = np.random.default_rng(prime)
+    for multiple in range(3, prime - 2):
+        for spread_out in (True, False):
+            # packing the points into one plane makes the planes fail
+            candidates = context.word_length if spread_out else prime**2
+            word = np.zeros(context.word_length, dtype=np.uint8)
+            chosen = rng.choice(candidates, multiple * prime - 4, False)
+            word[chosen] = 1
+            assert context.score_word(word) == reference_score(context, word)
+
+
+def test_position_lists_match_dense() -> None:
+    """
+    Scoring precomputed position lists agrees with the dense words.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(5)
+    words = np.zeros((40, context.word_length), dtype=np.uint8)
+    for word in words:
+        word[rng.choice(context.word_length, rng.integers(10, 31), False)] = 1
+    position_lists = [np.flatnonzero(word) for word in words]
+    dense = context.score_words(words)
+    assert np.array_equal(
+        context.score_words(position_lists, positions=True), dense
+    )
+    assert np.array_equal(
+        context.score_words_parallel(position_lists, positions=True),
+        dense,
+    )
+    assert [context.score_positions(p) for p in position_lists] == [
+        context.score_word(word) for word in words
+    ]
+
+
+def test_pack_positions() -> None:
+    """
+    Offsets delimit each word's positions, empty words included.
+    """
+    positions, offsets = lws.pack_positions(
+        [np.array([3, 1]), np.array([], dtype=np.int64), np.array([2])]
+    )
+    assert positions.tolist() == [3, 1, 2]
+    assert offsets.tolist() == [0, 2, 2, 3]
+    positions, offsets = lws.pack_positions([])
+    assert len(positions) == 0 and offsets.tolist() == [0]
+    assert len(lws.get_context(5, 3).score_words([], positions=True)) == 0
+
+
+def test_dense_words_in_any_container() -> None:
+    """
+    Dense words score the same as an array, a list or a tensor.
+    """
+    context = lws.get_context(5, 3)
+    words = random_words(3, 0.4)[:, : context.word_length]
+    expected = context.score_words(words)
+    assert np.array_equal(context.score_words(list(words)), expected)
+    assert np.array_equal(
+        context.score_words_blocked(torch.from_numpy(words).float()),
+        expected,
+    )
+
+
+def test_misshaped_input_raises() -> None:
+    """
+    Input not of the stated form is rejected instead of scored.
+    """
+    context = lws.get_context(5, 3)
+    words = random_words(3, 0.4)[:, : context.word_length]
+    position_lists = [np.flatnonzero(word) for word in words]
+    score_methods = [
+        context.score_words,
+        context.score_words_parallel,
+        context.score_words_blocked,
+    ]
+    for score in score_methods:
+        with pytest.raises(ValueError):
+            score(words[:, :-1])
+        with pytest.raises(ValueError):
+            score(words * 3)
+        with pytest.raises(ValueError):
+            score(position_lists)
+        with pytest.raises(ValueError):
+            score([word + context.word_length for word in position_lists])
+        with pytest.raises(ValueError):
+            score(
+                [word + context.word_length for word in position_lists],
+                positions=True,
+            )
+
+
+@pytest.mark.parametrize("block_size", [None, 1, 7, 1000])
+def test_blocked_matches_per_word(block_size) -> None:
+    """
+    Point-major blocked scoring gives the same scores in the same order.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(8)
+    words = np.zeros((60, context.word_length), dtype=np.uint8)
+    for number, word in enumerate(words):
+        # alternate spread out and packed words so every stage is hit
+        candidates = context.word_length if number % 2 else 49
+        word[rng.choice(candidates, rng.integers(1, 6) * 7 - 4, False)] = 1
+    expected = context.score_words(words)
+    assert np.array_equal(
+        context.score_words_blocked(words, block_size), expected
+    )
+    position_lists = [np.flatnonzero(word) for word in words]
+    assert np.array_equal(
+        context.score_words_blocked(
+            position_lists, block_size, positions=True
+        ),
+        expected,
+    )
+
+
+def test_blocked_skips_words_failing_size() -> None:
+    """
+    Words failing the size section keep their place among the rest,
+    including a batch where none pass.
+    """
+    context = lws.get_context(7, 3)
+    rng = np.random.default_rng(10)
+    words = (rng.random((50, context.word_length)) < 0.3).astype(np.uint8)
+    for word in words[::3]:
+        word[:] = 0
+        word[rng.choice(context.word_length, 17, False)] = 1
+    expected = context.score_words(words)
+    assert np.array_equal(context.score_words_blocked(words, 4), expected)
+    position_lists = [np.flatnonzero(word) for word in words]
+    assert np.array_equal(
+        context.score_words_blocked(position_lists, 4, positions=True),
+        expected,
+    )
+    failing = words[1::3]
+    assert np.array_equal(
+        context.score_words_blocked(failing), context.score_words(failing)
+    )
+
+
+@pytest.mark.parametrize("prime, dimension", [(5, 3), (3, 4)])
+def test_closed_form_matches_lookup(prime, dimension) -> None:
+    """
+    Computing intercepts on the fly scores exactly like the lookups.
+    """
+    lookup_context = lws.get_context(prime, dimension)
+    context = lws.ScoringContext(prime, dimension, memory_budget=0)
+    assert not context.uses_lookup and context.plane_lookup is None
+    rng = np.random.default_rng(9)
+    words = np.zeros((40, context.word_length), dtype=np.uint8)
+    for number, word in enumerate(words):
+        candidates = context.word_length if number % 2 else prime**2
+        size = rng.integers(2, prime + 1) * prime - len(context.fixed_indices)
+        word[rng.choice(candidates, min(size, candidates), False)] = 1
+    expected = lookup_context.score_words(words)
+    assert np.array_equal(context.score_words(words), expected)
+    assert np.array_equal(context.score_words_parallel(words), expected)
+    assert np.array_equal(context.score_words_blocked(words, 7), expected)
+
+
+def test_wide_incidence_does_not_overflow() -> None:
+    """
+    At p=19 a plane can hold more than 255 points of a valid size word.
+    """
+    context = lws.get_context(19, 3)
+    assert context.plane_incidence_dtype == np.uint16
+    assert context.line_incidence_dtype == np.uint8
+    plane = context.plane_lookup[context.valid_indices, 0] == 0
+    word = np.zeros(context.word_length, dtype=np.uint8)
+    word[np.flatnonzero(plane)[:300]] = 1
+    assert context.score_word(word) == reference_score(context, word)
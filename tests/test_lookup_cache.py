@@ -0,0 +1,91 @@
+"""
+Tests for the on-disk lookup table cache
+"""
+
+import numpy as np
+import pytest
+
+import pointconfig.lightweight_utils as lwu
+import pointconfig.lookup_cache as cache
+
+
+@pytest.fixture(name="cache_root")
+def fixture_cache_root(tmp_path, monkeypatch):
+    """
+    Points the cache at a temporary directory.
+    """
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path))
+    return tmp_path
+
+
+def test_miss_then_hit(cache_root) -> None:
+    """
+    The first load builds and writes the table, the second memory maps it.
+    """
+    built = lwu.make_plane_lookup(5, 3)
+    first = cache.load_lookup("plane", 5, 3, lwu.make_plane_lookup)
+    path = cache.lookup_path("plane", 5, 3)
+    assert path.exists()
+    assert path.parent == cache_root / f"v{cache.LOOKUP_CACHE_VERSION}"
+    assert not first.flags.writeable
+
+    def fail(prime, dimension):
+        raise AssertionError("cache hit should not rebuild")
+
+    second = cache.load_lookup("plane", 5, 3, fail)
+    assert isinstance(second, np.memmap)
+    assert not second.flags.writeable
+    assert np.array_equal(first, built)
+    assert np.array_equal(second, built)
+
+
+def test_keys_are_separate(cache_root) -> None:
+    """
+    Different names, primes and dimensions do not collide.
+    """
+    plane = cache.load_lookup("plane", 3, 2, lwu.make_plane_lookup)
+    line = cache.load_lookup("line", 3, 2, lwu.make_line_lookup)
+    bigger = cache.load_lookup("plane", 3, 3, lwu.make_plane_lookup)
+    assert line.dtype == np.uint8
+    assert plane.shape == (9, 4)
+    assert bigger.shape == (27, 13)
+    assert len(list(cache_root.rglob("*.npy"))) == 3
+
+
+def test_corrupt_file_is_rebuilt(cache_root) -> None:
+    """
+    An unreadable cache file is replaced rather than trusted.
+    """
+    path = cache.lookup_path("line", 3, 3)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"not a numpy file")
+    lookup = cache.load_lookup("line", 3, 3, lwu.make_line_lookup)
+    assert np.array_equal(lookup, lwu.make_line_lookup(3, 3))
+    assert np.array_equal(np.load(path), lookup)
+
+
+def test_failed_write_leaves_nothing(tmp_path) -> None:
+    """
+    A write that raises keeps the old file and leaves no temporary file.
+    """
+    path = tmp_path / "table.npy"
+    cache.save_atomically(path, lambda f: np.save(f, np.arange(3)))
+
+    def fail(f):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        cache.save_atomically(path, fail)
+    assert list(tmp_path.iterdir()) == [path]
+    assert np.load(path).tolist() == [0, 1, 2]
+
+
+def test_lookup_dtypes_fit_the_field() -> None:
+    """
+    Lookup entries use the smallest unsigned type holding an intercept.
+    """
+    assert lwu.make_plane_lookup(3, 3).dtype == np.uint8
+    assert lwu.make_line_lookup(3, 3).dtype == np.uint8
+    assert lwu.make_line_lookup(17, 3).dtype == np.uint16
+    assert lwu.make_plane_lookup(257, 1).dtype == np.uint16
@@ -0,0 +1,258 @@
+"""
+Tests for sampling words from the model
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import pointconfig.lightweight_score as lws
+import pointconfig.make_subset as ms
+import pointconfig.model as pcm
+import pointconfig.train as pct
+from pointconfig.expand_subset import expand_subsets
+from pointconfig.compiled_sampler import CompiledSampler
+
+
+def full_forward_subsets(model, num_subsets, context):
+    """
+    Reference sampler running the whole model on the full input each stage.
+    """
+    word_length = context.word_length
+    all_subsets = torch.zeros((num_subsets, 2 * word_length))
+    for stage in range(word_length):
+        all_subsets[:, stage + word_length] = 1.0
+        probs = pcm.model_forward(all_subsets, model)
+        all_subsets[:, stage] = (torch.rand(num_subsets) < probs).float()
+        all_subsets[:, stage + word_length] = 0.0
+    return all_subsets
+
+
+def test_incremental_matches_full_forward() -> None:
+    """
+    Same RNG state, same samples and scores as the full forward pass.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.build_model(2 * context.word_length)
+    # push the probabilities away from 0 and 1 so both bits show up
+    torch.nn.init.normal_(model[-2].weight, std=0.1)
+
+    torch.manual_seed(1)
+    expected = full_forward_subsets(model, 64, context)
+    torch.manual_seed(1)
+    subsets, scores = ms.generate_subsets(model, 64, context=context)
+    assert torch.equal(subsets, expected)
+    assert 0 < subsets[:, : context.word_length].mean() < 1
+    assert np.array_equal(
+        scores,
+        context.score_words(
+            expected[:, : context.word_length].numpy().astype(np.uint8)
+        ),
+    )
+
+
+def test_embedding_sampling_matches_full_forward() -> None:
+    """
+    The stage embedding model samples like its full forward pass.
+    """
+    context = lws.get_context(5, 3)
+    word_length = context.word_length
+    torch.manual_seed(0)
+    model = pcm.make_model(word_length, pcm.EMBEDDING)
+    torch.nn.init.normal_(model.rest[-2].weight, std=0.1)
+
+    torch.manual_seed(1)
+    expected = torch.zeros((64, word_length + 1))
+    for stage in range(word_length):
+        expected[:, word_length] = stage
+        probs = pcm.model_forward(expected, model)
+        expected[:, stage] = (torch.rand(64) < probs).float()
+    torch.manual_seed(1)
+    subsets, _ = ms.generate_subsets(model, 64, context=context)
+    assert subsets.shape == (64, word_length)
+    assert torch.equal(subsets, expected[:, :word_length])
+
+
+def test_generate_top_subsets_matches_one_batch() -> None:
+    """
+    Folding chunks into a running top keeps the best of all the chunks.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.make_model(context.word_length)
+
+    torch.manual_seed(1)
+    subsets, scores = ms.generate_top_subsets(
+        model, 95, 9, chunk_size=20, context=context
+    )
+    torch.manual_seed(1)
+    expected = torch.cat(
+        [
+            ms.sample_subsets(model, min(20, 95 - start), context)
+            for start in range(0, 95, 20)
+        ]
+    )
+    expected_scores = context.score_words(
+        expected[:, : context.word_length].numpy().astype(np.uint8)
+    )
+    assert subsets.shape == (9, 2 * context.word_length)
+    assert np.array_equal(np.sort(scores), np.sort(expected_scores)[-9:])
+    for subset, score in zip(subsets, scores):
+        rows = (expected == subset).all(dim=1).numpy()
+        assert rows.any() and score in expected_scores[rows]
+
+
+def test_highest_subsets_any_batch_size() -> None:
+    """
+    Selection is sized by the batch it is given.
+    """
+    subsets = torch.arange(37).unsqueeze(1)
+    scores = np.arange(37.0)[::-1].copy()
+    best, best_scores = ms.get_highest_subsets(subsets, scores, 90)
+    assert sorted(best_scores) == [33.0, 34.0, 35.0, 36.0]
+    assert sorted(best.flatten().tolist()) == [0, 1, 2, 3]
+    best, best_scores = ms.top_subsets(subsets, scores, 0)
+    assert len(best) == len(best_scores) == 0
+    assert ms.elite_count(100_000, 99.9) == 100
+    assert ms.elite_count(5, 90) == 1
+    assert [ms.elite_count(n, 90) for n in (15, 25)] == [2, 3]
+    assert ms.elite_count(0, 90) == 0
+
+
+@pytest.mark.parametrize("early_rejection", [False, True])
+def test_train_with_tiny_samples_per_loop(early_rejection) -> None:
+    """
+    A handful of samples per loop still trains on one elite.
+    """
+    pct.train(
+        loops=2,
+        plot=False,
+        save_checkpoint=False,
+        prime=5,
+        dimension=3,
+        early_rejection=early_rejection,
+        samples_per_loop=5,
+    )
+
+
+def test_inference_model_sampling_matches_its_forward() -> None:
+    """
+    The incremental sampler runs the reduced precision copy unchanged.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.build_model(2 * context.word_length)
+    torch.nn.init.normal_(model[-2].weight, std=0.1)
+    sampler = pcm.InferenceModel(model, pcm.INT8)
+
+    torch.manual_seed(1)
+    expected = full_forward_subsets(sampler, 64, context)
+    torch.manual_seed(1)
+    subsets, _ = ms.generate_subsets(sampler, 64, context=context)
+    assert torch.equal(subsets, expected)
+
+
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_compiled_sampler_matches_eager(stage_encoding) -> None:
+    """
+    Same RNG state, same samples from the scripted loop, and weight
+    updates are picked up without a new sampler.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.make_model(context.word_length, stage_encoding)
+    sampler = CompiledSampler(model, num_threads=1)
+    for _ in range(2):
+        torch.manual_seed(1)
+        expected = ms.sample_subsets(model, 64, context)
+        torch.manual_seed(1)
+        assert torch.equal(ms.sample_subsets(sampler, 64, context), expected)
+        with torch.no_grad():
+            next(model.parameters()).normal_(std=0.1)
+    assert CompiledSampler(model).sample_loop is sampler.sample_loop
+
+
+def test_compiled_sampler_needs_float32() -> None:
+    """
+    Reduced precision copies are not scripted.
+    """
+    model = pcm.make_model(lws.get_context(5, 3).word_length)
+    with pytest.raises(ValueError):
+        CompiledSampler(pcm.InferenceModel(model, pcm.BFLOAT16))
+
+
+def test_train_rejects_compiled_reduced_precision(monkeypatch) -> None:
+    """
+    train refuses a compiled sampler at reduced precision up front.
+    """
+
+    def no_work(*args, **kwargs):
+        raise AssertionError("train started before checking its settings")
+
+    monkeypatch.setattr(pct, "plot_beginning", no_work)
+    monkeypatch.setattr(pct, "load_checkpoint", no_work)
+    for precision in (pcm.BFLOAT16, pcm.INT8):
+        with pytest.raises(ValueError):
+            pct.train(compiled_sampler=True, inference_precision=precision)
+
+
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_generate_subset_matches_batch_sampler(stage_encoding) -> None:
+    """
+    One word at a time draws what sample_subsets draws for one row, and
+    returns its training rows and score.
+    """
+    context = lws.get_context(5, 3)
+    word_length = context.word_length
+    torch.manual_seed(0)
+    model = pcm.make_model(word_length, stage_encoding)
+    torch.manual_seed(1)
+    expected = ms.sample_subsets(model, 1, context)
+    torch.manual_seed(1)
+    all_stages, score = ms.generate_subset(model, context)
+    word = expected[0, :word_length].numpy().astype(np.uint8)
+    assert np.array_equal(all_stages[:, -1], word)
+    assert np.array_equal(
+        all_stages, expand_subsets(expected, word_length, stage_encoding)
+    )
+    assert score == context.score_word(word)
+
+
+def test_generate_subset_stage_scores() -> None:
+    """
+    Every stage yields the score of the word sampled so far.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.make_model(context.word_length)
+    torch.nn.init.normal_(model[-2].weight, std=0.1)
+    word = np.zeros(context.word_length, dtype=np.uint8)
+    stages = list(ms.generate_subset_stages(model, context))
+    assert [stage for stage, _, _ in stages] == list(
+        range(context.word_length)
+    )
+    for stage, included, score in stages:
+        word[stage] = included
+        assert score == context.score_word(word)
+    assert 0 < word.mean() < 1
+
+
+def test_factorized_sampling() -> None:
+    """
+    A factorized model draws whole words in one step with its
+    probabilities, and the compiled sampler runs it too.
+    """
+    context = lws.get_context(5, 3)
+    word_length = context.word_length
+    model = pcm.make_model(word_length, model_kind=pcm.FACTORIZED)
+    with torch.no_grad():
+        model.logits[: word_length // 2] = 20.0
+        model.logits[word_length // 2 :] = -20.0
+    expected = torch.zeros(word_length)
+    expected[: word_length // 2] = 1.0
+    for sampler in (model, CompiledSampler(model)):
+        subsets, scores = ms.generate_subsets(sampler, 8, context=context)
+        assert subsets.shape == (8, word_length)
+        assert torch.equal(subsets, expected.expand(8, -1))
+        assert len(scores) == 8
@@ -0,0 +1,168 @@
+"""
+Tests for the model, its stage encodings and checkpoints
+"""
+
+import pytest
+import torch
+
+import pointconfig.checkpoint as cp
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+from pointconfig.expand_subset import expand_subsets
+from pointconfig.trainingtracker import TrainingTracker
+
+
+def embedding_copy(one_hot_model, word_length):
+    """
+    StageEmbeddingModel computing the same function as one_hot_model.
+    """
+    model = pcm.StageEmbeddingModel(word_length)
+    bit_columns, stage_rows, bias, rest = pcm.first_layer_parts(one_hot_model)
+    with torch.no_grad():
+        model.first_layer.weight.copy_(bit_columns.T)
+        model.first_layer.bias.copy_(bias)
+        model.stage_embedding.weight.copy_(stage_rows)
+        for parameter, source in zip(
+            model.rest.parameters(), rest.parameters()
+        ):
+            parameter.copy_(source)
+    return model
+
+
+def test_embedding_matches_one_hot() -> None:
+    """
+    The two encodings give the same predictions on the same subsets.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    one_hot_model = pcm.make_model(word_length, pcm.ONE_HOT)
+    model = embedding_copy(one_hot_model, word_length)
+    subsets = (torch.rand(8, word_length) < 0.5).float()
+
+    one_hot_rows = expand_subsets(
+        torch.cat([subsets, torch.zeros_like(subsets)], dim=1), word_length
+    )
+    rows = expand_subsets(subsets, word_length, pcm.EMBEDDING)
+    assert rows.shape == (8 * word_length, word_length + 2)
+    assert torch.equal(rows[:, -1], one_hot_rows[:, -1])
+    assert torch.allclose(
+        model(rows[:, :-1]), one_hot_model(one_hot_rows[:, :-1]), atol=1e-6
+    )
+
+
+def test_unknown_stage_encoding() -> None:
+    """
+    Unknown stage encodings are rejected.
+    """
+    with pytest.raises(ValueError):
+        pcm.make_model(10, "binary")
+
+
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_checkpoint_keeps_stage_encoding(tmp_path, stage_encoding) -> None:
+    """
+    load_model rebuilds the model with the encoding it was trained with.
+    """
+    context = lws.get_context(5, 3)
+    complete_model_info = pcm.model_info(context, stage_encoding)
+    save_path = cp.checkpoint(
+        50, complete_model_info, TrainingTracker(10), False, tmp_path
+    )
+    model_path = next(save_path.glob("model*.pt"))
+    model, _, loop_num, _, loaded_context, loaded_encoding = cp.load_model(
+        model_path
+    )
+    assert loaded_encoding == stage_encoding
+    assert loaded_context is context and loop_num == 50
+    assert pcm.stage_encoding_of(model) == stage_encoding
+    for name, tensor in complete_model_info["model"].state_dict().items():
+        assert torch.equal(model.state_dict()[name], tensor)
+
+
+@pytest.mark.parametrize("precision", (pcm.BFLOAT16, pcm.INT8))
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_inference_model_close_to_float32(precision, stage_encoding) -> None:
+    """
+    Reduced precision predictions stay close to the float32 model.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    model = pcm.make_model(word_length, stage_encoding).eval()
+    sampler = pcm.InferenceModel(model, precision)
+    subsets = torch.zeros((8, pcm.subset_width(word_length, stage_encoding)))
+    subsets[:, :word_length] = (torch.rand(8, word_length) < 0.5).float()
+    rows = expand_subsets(subsets, word_length, stage_encoding)[:, :-1]
+    with torch.no_grad():
+        assert torch.allclose(sampler(rows), model(rows), atol=1e-2)
+    assert pcm.stage_encoding_of(sampler) == stage_encoding
+
+
+def test_inference_model_refresh() -> None:
+    """
+    The reduced precision copy only follows the weights after refresh.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    model = pcm.make_model(word_length)
+    sampler = pcm.InferenceModel(model, pcm.BFLOAT16)
+    rows = torch.zeros((1, 2 * word_length))
+    rows[0, word_length] = 1
+    with torch.no_grad():
+        model[-2].bias.fill_(10.0)
+        assert sampler(rows).item() < 0.99
+        sampler.refresh()
+        assert sampler(rows).item() > 0.99
+    assert pcm.inference_model(model, pcm.FLOAT32) is model
+    with pytest.raises(ValueError):
+        pcm.InferenceModel(model, "float16")
+
+
+def test_factorized_model() -> None:
+    """
+    The factorized model predicts each position from its own logit,
+    its first layer parts agree and it learns the elites' frequencies.
+    """
+    word_length = lws.get_context(5, 3).word_length
+    torch.manual_seed(0)
+    complete_model_info = pcm.model_info(
+        lws.get_context(5, 3), model_kind=pcm.FACTORIZED
+    )
+    model = complete_model_info["model"]
+    assert complete_model_info["stage_encoding"] == pcm.EMBEDDING
+    assert pcm.model_kind_of(model) == pcm.FACTORIZED
+    elites = torch.zeros((64, word_length))
+    elites[:, : word_length // 2] = 1.0
+    rows = expand_subsets(elites, word_length, pcm.EMBEDDING)
+    for _ in range(20):
+        pcm.train_model(
+            rows,
+            model,
+            complete_model_info["loss_function"],
+            complete_model_info["optimizer"],
+        )
+    probs = torch.sigmoid(model.logits)
+    assert (probs[: word_length // 2] > 0.5).all()
+    assert (probs[word_length // 2 :] < 0.5).all()
+
+    _, stage_rows, bias, rest = pcm.first_layer_parts(model)
+    with torch.no_grad():
+        assert torch.allclose(
+            rest(bias + stage_rows).flatten(),
+            pcm.model_forward(rows[:word_length, :-1], model),
+        )
+    with pytest.raises(ValueError):
+        pcm.make_model(word_length, model_kind="tree")
+
+
+def test_checkpoint_keeps_model_kind(tmp_path) -> None:
+    """
+    load_model rebuilds a factorized model as factorized.
+    """
+    complete_model_info = pcm.model_info(
+        lws.get_context(5, 3), model_kind=pcm.FACTORIZED
+    )
+    save_path = cp.checkpoint(
+        1, complete_model_info, TrainingTracker(10), False, tmp_path
+    )
+    model = cp.load_model(next(save_path.glob("model*.pt")))[0]
+    assert isinstance(model, pcm.FactorizedModel)
+    assert torch.equal(model.logits, complete_model_info["model"].logits)
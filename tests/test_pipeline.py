@@ -0,0 +1,68 @@
+"""
+Tests for the overlapped sample and score pipeline
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import pointconfig.lightweight_score as lws
+import pointconfig.make_subset as ms
+import pointconfig.model as pcm
+import pointconfig.pipeline as pipe
+
+
+@pytest.mark.parametrize("chunk_size, depth, workers", [(7, 1, 1), (16, 3, 2)])
+def test_pipeline_matches_generate_subsets(chunk_size, depth, workers) -> None:
+    """
+    Chunked, overlapped sampling gives the same batch as one big sample.
+    """
+    context = lws.get_context(5, 3)
+    torch.manual_seed(0)
+    model = pcm.make_model(context.word_length)
+
+    torch.manual_seed(1)
+    subsets, scores, stats = pipe.sample_and_score(
+        model, 50, chunk_size, depth, workers, context
+    )
+    assert subsets.shape == (50, 2 * context.word_length)
+    assert np.array_equal(
+        scores,
+        context.score_words(
+            subsets[:, : context.word_length].numpy().astype(np.uint8)
+        ),
+    )
+    assert stats.chunks == -(-50 // chunk_size)
+    assert 0 < stats.sample_utilisation <= 1
+    assert 0 < stats.score_utilisation <= 1
+    assert "chunks" in stats.summary()
+
+    # the sampler draws the same random numbers in the same order
+    torch.manual_seed(1)
+    expected = torch.cat(
+        [
+            ms.sample_subsets(model, min(chunk_size, 50 - start), context)
+            for start in range(0, 50, chunk_size)
+        ]
+    )
+    assert torch.equal(subsets, expected)
+
+
+def test_best_from_pipeline() -> None:
+    """
+    Selection keeps the top tenth of a full batch, as best_from_model.
+    """
+    model = pcm.make_model()
+    best_subsets, best_scores, stats = pipe.best_from_pipeline(
+        model, lws.BATCH_SIZE, workers=2
+    )
+    assert len(best_subsets) == len(best_scores) == lws.BATCH_SIZE // 10
+    assert stats.select_time > 0 and stats.chunks == 4
+
+
+def test_pipeline_rejects_bad_config() -> None:
+    """
+    Zero depth or workers would never score anything.
+    """
+    with pytest.raises(ValueError):
+        pipe.sample_and_score(pcm.make_model(), 10, depth=0)
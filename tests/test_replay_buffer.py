@@ -0,0 +1,91 @@
+"""
+Tests for the elite replay buffer
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import pointconfig.model as pcm
+from pointconfig.expand_subset import expand_subsets
+from pointconfig.replay_buffer import ReplayBuffer, SCORE, AGE_DECAYED
+
+WORD_LENGTH = 20
+
+
+def distinct_words(num_words, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.unique(rng.integers(0, 2, (4 * num_words, WORD_LENGTH)), axis=0)
+    return words[rng.permutation(len(words))[:num_words]].astype(np.uint8)
+
+
+def held(buffer):
+    words = np.unpackbits(
+        buffer.packed_words[: buffer.size], axis=1, count=WORD_LENGTH
+    )
+    return {word.tobytes(): score for word, score in zip(words, buffer.scores)}
+
+
+def test_duplicates_are_dropped() -> None:
+    """
+    Words already held, or repeated in the batch, are added once.
+    """
+    words = distinct_words(5)
+    buffer = ReplayBuffer(10, WORD_LENGTH)
+    assert buffer.add(np.concatenate([words, words[:2]]), np.arange(7), 0) == 5
+    assert buffer.add(torch.from_numpy(words[:3]).float(), np.ones(3), 1) == 0
+    assert len(buffer) == 5
+
+
+def test_score_eviction_keeps_the_best() -> None:
+    """
+    A full buffer holds the highest scoring words it has seen.
+    """
+    words = distinct_words(30)
+    scores = np.random.default_rng(1).permutation(30).astype(np.float64)
+    buffer = ReplayBuffer(8, WORD_LENGTH, SCORE)
+    for loop_num, start in enumerate(range(0, 30, 7)):
+        buffer.add(
+            words[start : start + 7], scores[start : start + 7], loop_num
+        )
+    best = np.argsort(scores)[-8:]
+    assert len(buffer) == 8
+    assert held(buffer) == {
+        words[index].tobytes(): scores[index] for index in best
+    }
+
+
+def test_age_decayed_eviction_prefers_fresh_words() -> None:
+    """
+    With age decay an old elite gives way to a slightly worse new one.
+    """
+    words = distinct_words(4)
+    buffer = ReplayBuffer(2, WORD_LENGTH, AGE_DECAYED, decay=0.5)
+    buffer.add(words[:2], np.array([10.0, 9.0]), 0)
+    buffer.add(words[2:], np.array([8.0, 1.0]), 1)
+    assert set(held(buffer)) == {words[0].tobytes(), words[2].tobytes()}
+    with pytest.raises(ValueError):
+        ReplayBuffer(2, WORD_LENGTH, "fifo")
+
+
+@pytest.mark.parametrize("stage_encoding", pcm.STAGE_ENCODINGS)
+def test_sample_gives_training_rows(stage_encoding) -> None:
+    """
+    Samples are training rows of held words without repeats.
+    """
+    words = distinct_words(6)
+    buffer = ReplayBuffer(10, WORD_LENGTH)
+    buffer.add(words, np.arange(6), 0)
+    training_set, scores = buffer.sample(4, stage_encoding)
+    assert len(training_set) == 4 * WORD_LENGTH
+    assert len(set(scores)) == 4
+    sampled = training_set.words(torch.arange(4))
+    subsets = torch.zeros((4, pcm.subset_width(WORD_LENGTH, stage_encoding)))
+    subsets[:, :WORD_LENGTH] = sampled
+    assert torch.equal(
+        training_set.rows(torch.arange(len(training_set))),
+        expand_subsets(subsets, WORD_LENGTH, stage_encoding),
+    )
+    for word, score in zip(sampled.numpy().astype(np.uint8), scores):
+        assert held(buffer)[word.tobytes()] == score
+    assert len(buffer.sample(100, stage_encoding)[1]) == 6
@@ -0,0 +1,70 @@
+"""
+Tests for sampling a checkpoint to disk
+"""
+
+import numpy as np
+import pytest
+
+import pointconfig.checkpoint as cp
+import pointconfig.lightweight_score as lws
+import pointconfig.model as pcm
+import pointconfig.sample as smp
+from pointconfig.trainingtracker import TrainingTracker
+
+
+def save_model(save_path, prime=7, dimension=3):
+    save_path.mkdir(exist_ok=True)
+    complete_model_info = pcm.model_info(lws.get_context(prime, dimension))
+    cp.checkpoint(
+        1, complete_model_info, TrainingTracker(10), False, save_path
+    )
+    return next(save_path.glob("model*.pt"))
+
+
+def test_resume_and_append(tmp_path) -> None:
+    """
+    Chunks hold packed words with their scores, and asking for more
+    subsets only adds new chunks.
+    """
+    model_path = save_model(tmp_path)
+    output = tmp_path / "samples"
+    written, _ = smp.sample_to_disk(model_path, output, 100, 40, 0, seed=0)
+    assert written == 100
+    assert len(smp.chunk_paths(output)) == 3
+    first_chunks = [path.read_bytes() for path in smp.chunk_paths(output)]
+
+    words, scores = smp.load_samples(output)
+    context = lws.get_context(7, 3)
+    assert words.shape == (100, context.word_length)
+    assert np.array_equal(scores, context.score_words(words))
+
+    assert smp.sample_to_disk(model_path, output, 100, 40, 0)[0] == 0
+    written, _ = smp.sample_to_disk(model_path, output, 150, 40, 0)
+    assert written == 50
+    paths = smp.chunk_paths(output)
+    assert [path.read_bytes() for path in paths[:3]] == first_chunks
+    assert len(smp.load_samples(output)[1]) == 150
+
+
+def test_worker_processes_match_in_process(tmp_path) -> None:
+    """
+    Chunks are seeded by index, so worker processes write the same
+    samples as the calling process.
+    """
+    model_path = save_model(tmp_path)
+    smp.sample_to_disk(model_path, tmp_path / "serial", 60, 20, 0, seed=3)
+    smp.sample_to_disk(model_path, tmp_path / "workers", 60, 20, 2, seed=3)
+    serial_words, serial_scores = smp.load_samples(tmp_path / "serial")
+    words, scores = smp.load_samples(tmp_path / "workers")
+    assert np.array_equal(words, serial_words)
+    assert np.array_equal(scores, serial_scores)
+
+
+def test_other_field_rejected(tmp_path) -> None:
+    """
+    Samples of different fields are not mixed in one directory.
+    """
+    output = tmp_path / "samples"
+    smp.sample_to_disk(save_model(tmp_path / "a"), output, 10, 10, 0)
+    with pytest.raises(ValueError):
+        smp.sample_to_disk(save_model(tmp_path / "b", 5), output, 20, 10, 0)
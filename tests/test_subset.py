@@ -6,7 +6,7 @@ Tests for the Subset class
 import itertools
 import pytest
 from pointconfig.subset import Subset
-from pointconfig.config_types import PointType
+from pointconfig.subset.config_types import PointType
 
 
 def test_lookup_updating() -> None:
@@ -4,11 +4,11 @@ Test the util functions
 
 import pytest
 
-from pointconfig.utils import get_directions
-from pointconfig.utils import get_plane_paramterizing_intercept
-from pointconfig.utils import get_line_paramterizing_intercept
-from pointconfig.utils import create_lookup_entry
-from pointconfig.utils import create_full_lookup_table
+from pointconfig.subset.utils import get_directions
+from pointconfig.subset.utils import get_plane_paramterizing_intercept
+from pointconfig.subset.utils import get_line_paramterizing_intercept
+from pointconfig.subset.utils import create_lookup_entry
+from pointconfig.subset.utils import create_full_lookup_table
 
 
 def test_get_directions() -> None: